@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""Throughput benchmark for length-bucketed batching in ``add_messages``.
+
+Encodes a synthetic chat corpus whose message lengths follow a realistic
+heavy-tailed mix (mostly short turns such as "thanks!" or one-line questions,
+some paragraphs, a few long pastes), comparing:
+
+- ``single``: one ``embedder.encode(texts)`` call over the whole corpus,
+  leaving batching to the backend (the previous behaviour)
+- ``bucketed``: ``encode_bucketed``, length-sorted batches sized to a token
+  budget
+
+For each strategy it reports texts/second, padding efficiency (real tokens /
+padded tokens, from the same estimate the bucketing uses) and the padded
+tokens of the largest batch, which bounds activation memory. The
+sentence-transformers backend already sorts each call by length and cuts it
+into ``batch_size`` chunks, so its single call is modelled that way; other
+backends pad the whole call to its longest text.
+
+On the default corpus (5000 messages) the estimates are:
+
+- sentence-transformers (``batch_size=256``): padding efficiency 84% single
+  vs 95% bucketed, largest batch 65,536 vs 8,192 padded tokens. The gain is
+  mostly bounded memory, with a modest cut in padded work.
+- ONNX (one padded call): 18% vs 95%, so bucketing does about a fifth of the
+  model work.
+
+Usage:
+    python benchmarks/bucketed_batching.py --messages 5000
+    python benchmarks/bucketed_batching.py --backend onnx --model-dir models/minilm
+"""
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+from typing import List
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from memory.embedders import create_embedder  # noqa: E402
+from memory.embedders.bucketing import (  # noqa: E402
+    DEFAULT_TOKEN_BUDGET,
+    estimate_tokens,
+    length_batches,
+)
+
+VOCABULARY = (
+    "the a to and of I you it is that for on with this can what how do we "
+    "model data memory search vector user message thanks please help error "
+    "python index query result time test deploy server latency batch token"
+).split()
+
+# (share of messages, min words, max words)
+LENGTH_MIX = [
+    (0.45, 1, 8),  # greetings, acknowledgements, short follow-ups
+    (0.35, 8, 40),  # typical questions and answers
+    (0.15, 40, 150),  # explanations
+    (0.05, 150, 400),  # long pastes (truncated by the model)
+]
+
+
+def make_corpus(n: int, seed: int) -> List[str]:
+    rng = random.Random(seed)
+    corpus = []
+    for _ in range(n):
+        roll = rng.random()
+        for share, low, high in LENGTH_MIX:
+            roll -= share
+            if roll <= 0:
+                break
+        words = rng.randint(low, high)
+        corpus.append(" ".join(rng.choice(VOCABULARY) for _ in range(words)))
+    return corpus
+
+
+def single_call_batches(embedder, texts: List[str]) -> List[List[int]]:
+    """Batches the backend forms inside one ``encode(texts)`` call."""
+    batch_size = getattr(embedder, "batch_size", None)
+    if batch_size is None:
+        return [list(range(len(texts)))]
+    # sentence-transformers sorts by length (longest first) before batching
+    order = sorted(range(len(texts)), key=lambda i: -len(texts[i]))
+    return [order[i : i + batch_size] for i in range(0, len(order), batch_size)]
+
+
+def padded_tokens(texts: List[str], batches: List[List[int]]) -> List[int]:
+    lengths = [estimate_tokens(text) for text in texts]
+    return [len(batch) * max(lengths[i] for i in batch) for batch in batches]
+
+
+def padding_efficiency(texts: List[str], batches: List[List[int]]) -> float:
+    real = sum(estimate_tokens(text) for text in texts)
+    return real / sum(padded_tokens(texts, batches))
+
+
+def run_single(embedder, texts: List[str]) -> float:
+    start = time.perf_counter()
+    embedder.encode(texts)
+    return len(texts) / (time.perf_counter() - start)
+
+
+def run_bucketed(embedder, texts: List[str], batches: List[List[int]]) -> float:
+    start = time.perf_counter()
+    out = np.zeros((len(texts), embedder.dimension), dtype=np.float32)
+    for batch in batches:
+        out[batch] = embedder.encode([texts[i] for i in batch])
+    return len(texts) / (time.perf_counter() - start)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=5000)
+    parser.add_argument("--token-budget", type=int, default=DEFAULT_TOKEN_BUDGET)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--backend", default="sentence-transformers", help="Embedder backend"
+    )
+    parser.add_argument("--model-dir", help="Model directory for --backend onnx")
+    args = parser.parse_args()
+
+    kwargs = {"model_dir": args.model_dir} if args.model_dir else {}
+    embedder = create_embedder(args.backend, **kwargs)
+    texts = make_corpus(args.messages, args.seed)
+    embedder.encode(texts[:8])  # warm up: load the model
+
+    bucketed = length_batches(texts, args.token_budget)
+    strategies = {
+        "single": (single_call_batches(embedder, texts), run_single(embedder, texts)),
+        "bucketed": (bucketed, run_bucketed(embedder, texts, bucketed)),
+    }
+    for name, (batches, rate) in strategies.items():
+        print(
+            f"{name:9s} {rate:9.1f} texts/s  "
+            f"{len(batches):5d} batches  "
+            f"padding efficiency {padding_efficiency(texts, batches):.0%}  "
+            f"largest batch {max(padded_tokens(texts, batches)):,} tokens"
+        )
+    speedup = strategies["bucketed"][1] / strategies["single"][1]
+    print(f"speedup   {speedup:.2f}x")
+    embedder.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""Startup-time benchmark for Cortex.
+
+Measures, each in a fresh interpreter, how long it takes to:
+
+- ``import``: import the ``memory`` package
+- ``open``: open a ``ConversationMemory`` and list a conversation (what
+  ``cortex get`` / ``stats`` / ``search-content`` pay)
+- ``first-embed``: open it and embed a first query (includes the model load)
+
+and checks that opening a memory does not import ``sentence_transformers``.
+Exits non-zero when ``open`` exceeds ``--budget`` seconds or the model is
+imported eagerly, so it can guard against startup regressions.
+
+Usage:
+    python benchmarks/startup_time.py --runs 5 --budget 1.5
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+SCENARIOS = {
+    "import": "import memory",
+    "open": (
+        "from memory import ConversationMemory\n"
+        "memory = ConversationMemory({db!r}, {vectors!r})\n"
+        "memory.get_conversation('bench-user', limit=10)\n"
+        "memory.close()\n"
+    ),
+    "first-embed": (
+        "from memory import ConversationMemory\n"
+        "memory = ConversationMemory({db!r}, {vectors!r})\n"
+        "memory._get_embedding('hello world')\n"
+        "memory.close()\n"
+    ),
+}
+
+# Appended to a scenario to report whether the embedding stack was imported
+_REPORT = (
+    "\nimport json, sys\n"
+    "print(json.dumps({'model_imported': 'sentence_transformers' in sys.modules}))\n"
+)
+
+_TIMER = (
+    "import time\n"
+    "_start = time.perf_counter()\n"
+    "{body}\n"
+    "print(json.dumps({{'seconds': time.perf_counter() - _start}}))\n"
+)
+
+
+def run_scenario(code: str) -> dict:
+    """Run ``code`` in a fresh interpreter and return its timing report."""
+    script = "import json\n" + _TIMER.format(body=code) + _REPORT
+    output = subprocess.run(
+        [sys.executable, "-c", script],
+        cwd=REPO_ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    report = {}
+    for line in output.splitlines():
+        if line.startswith("{"):
+            report.update(json.loads(line))
+    return report
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5, help="Runs per scenario")
+    parser.add_argument(
+        "--budget",
+        type=float,
+        default=None,
+        help="Fail if the median 'open' time exceeds this many seconds",
+    )
+    parser.add_argument(
+        "--skip-embed",
+        action="store_true",
+        help="Skip the first-embed scenario (needs the model available)",
+    )
+    args = parser.parse_args()
+
+    failed = False
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = {"db": str(Path(tmp) / "bench.db"), "vectors": str(Path(tmp) / "vec")}
+        for name, template in SCENARIOS.items():
+            if name == "first-embed" and args.skip_embed:
+                continue
+            reports = [run_scenario(template.format(**paths)) for _ in range(args.runs)]
+            times = [report["seconds"] for report in reports]
+            print(
+                f"{name:12s} median {statistics.median(times):.3f}s  "
+                f"min {min(times):.3f}s  max {max(times):.3f}s"
+            )
+
+            if name == "open":
+                if any(report["model_imported"] for report in reports):
+                    print("  FAIL: opening a memory imported sentence_transformers")
+                    failed = True
+                if args.budget is not None and statistics.median(times) > args.budget:
+                    print(f"  FAIL: exceeds budget of {args.budget:.3f}s")
+                    failed = True
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
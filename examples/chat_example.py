@@ -120,17 +120,19 @@ class EnhancedChatBot:
     def get_memory_context(self, query: str, limit: int = 3) -> str:
         """Get relevant memory context from previous conversations."""
         # Search for semantically similar messages from previous conversations
-        similar_messages = self.memory.search_similar(self.user_id, query, limit=limit)
+        similar_messages = self.memory.search_similar(
+            self.user_id,
+            query,
+            limit=limit,
+            exclude_conversation_ids=[self.conversation_id],
+        )
 
         if not similar_messages:
             return ""
 
         context_lines = ["Relevant memories from previous conversations:"]
         for msg, score in similar_messages:
-            if (
-                msg.conversation_id != self.conversation_id
-            ):  # Only from other conversations
-                context_lines.append(f"- [{score:.2f}] {msg.role}: {msg.content}")
+            context_lines.append(f"- [{score:.2f}] {msg.role}: {msg.content}")
 
         return "\n".join(context_lines)
 
@@ -147,19 +149,12 @@ class EnhancedChatBot:
         return self.memory.get_user_stats(self.user_id)
 
     def get_conversation_history(self, days: int = 7) -> List[Message]:
-        """Get conversation history from the last N days."""
+        """Get conversation history from the last N days, oldest first."""
         cutoff_date = datetime.utcnow() - timedelta(days=days)
         cutoff_str = cutoff_date.isoformat()
 
-        # Get all messages from the last N days
-        messages = self.memory.get_conversation(self.user_id, limit=1000)
-        recent_messages = [
-            msg
-            for msg in messages
-            if datetime.fromisoformat(msg.timestamp) > cutoff_date
-        ]
-
-        return recent_messages
+        # The time range is applied in SQL, so no message is missed or over-read
+        return list(self.memory.iter_conversation(self.user_id, since=cutoff_str))
 
     def chat(self, user_input: str) -> str:
         """Process user input with enhanced memory context."""
@@ -1,8 +1,16 @@
 from .conversation import ConversationMemory, Message
-from .store import SQLiteStore
+from .embedding_cache import EmbeddingCache
+from .model_registry import ModelRegistry, preload_model
+from .query_cache import QueryEmbeddingCache
+from .store import SQLiteStore, UnitOfWork
 
 __all__ = [
     "ConversationMemory",
+    "EmbeddingCache",
     "Message",
+    "ModelRegistry",
+    "QueryEmbeddingCache",
     "SQLiteStore",
+    "UnitOfWork",
+    "preload_model",
 ]
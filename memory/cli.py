@@ -4,6 +4,7 @@
 import argparse
 import json
 import uuid
+from dataclasses import asdict
 from datetime import datetime
 from pathlib import Path
 from typing import List, Optional
@@ -49,7 +50,7 @@ def add_message_cmd(args):
 
 def add_conversation_cmd(args):
     """Add a conversation from a JSON file."""
-    memory = ConversationMemory(args.db_path, args.vector_dir)
+    memory = ConversationMemory(args.db_path, args.vector_dir, workers=args.workers)
 
     try:
         with open(args.file, "r") as f:
@@ -61,7 +62,7 @@ def add_conversation_cmd(args):
         for msg_data in conversation_data:
             message = Message(
                 user_id=args.user_id,
-                message_id=str(uuid.uuid4()),
+                message_id=msg_data.get("message_id", str(uuid.uuid4())),
                 content=msg_data["content"],
                 role=msg_data.get("role", "user"),
                 timestamp=msg_data.get("timestamp", datetime.utcnow().isoformat()),
@@ -70,7 +71,7 @@ def add_conversation_cmd(args):
             )
             messages.append(message)
 
-        message_ids = memory.add_messages(messages)
+        message_ids = memory.add_messages(messages, on_conflict=args.on_conflict)
         print(f"Added {len(message_ids)} messages to conversation {conversation_id}")
 
     finally:
@@ -83,12 +84,36 @@ def get_conversation_cmd(args):
 
     try:
         messages = memory.get_conversation(
-            user_id=args.user_id, conversation_id=args.conversation_id, limit=args.limit
+            user_id=args.user_id,
+            conversation_id=args.conversation_id,
+            limit=args.limit,
+            after_timestamp=args.after_timestamp,
+            after_id=args.after_id,
+            since=args.since,
+            until=args.until,
         )
 
         print(f"Found {len(messages)} messages:")
         for msg in messages:
-            print(f"[{msg.timestamp}] {msg.role}: {msg.content[:100]}...")
+            print(
+                f"[{msg.timestamp}] ({msg.message_id}) {msg.role}: {msg.content[:100]}..."
+            )
+
+    finally:
+        memory.close()
+
+
+def export_cmd(args):
+    """Stream a user's messages as JSON lines, oldest first."""
+    memory = ConversationMemory(args.db_path, args.vector_dir)
+
+    try:
+        for msg in memory.iter_conversation(
+            user_id=args.user_id,
+            conversation_id=args.conversation_id,
+            batch_size=args.batch_size,
+        ):
+            print(json.dumps(asdict(msg)))
 
     finally:
         memory.close()
@@ -116,13 +141,13 @@ def search_content_cmd(args):
     memory = ConversationMemory(args.db_path, args.vector_dir)
 
     try:
-        messages = memory.search_by_content(
+        results = memory.search_by_content_with_snippets(
             user_id=args.user_id, query=args.query, limit=args.limit
         )
 
-        print(f"Found {len(messages)} messages containing '{args.query}':")
-        for msg in messages:
-            print(f"[{msg.timestamp}] {msg.role}: {msg.content[:100]}...")
+        print(f"Found {len(results)} messages containing '{args.query}':")
+        for msg, snippet in results:
+            print(f"[{msg.timestamp}] {msg.role}: {snippet}")
 
     finally:
         memory.close()
@@ -146,6 +171,18 @@ def stats_cmd(args):
         memory.close()
 
 
+def rebuild_index_cmd(args):
+    """Rebuild the vector index from embeddings stored in SQLite."""
+    memory = ConversationMemory(args.db_path, args.vector_dir)
+
+    try:
+        count = memory.rebuild_vector_index(batch_size=args.batch_size)
+        print(f"Rebuilt vector index with {count} messages")
+
+    finally:
+        memory.close()
+
+
 def main():
     parser = argparse.ArgumentParser(description="Cortex Conversation Memory CLI")
     parser.add_argument("--db-path", default="cortex.db", help="SQLite database path")
@@ -172,6 +209,18 @@ def main():
     conv_parser.add_argument(
         "--conversation-id", help="Conversation ID (auto-generated if not provided)"
     )
+    conv_parser.add_argument(
+        "--workers",
+        type=int,
+        default=0,
+        help="Encode with this many worker processes (large imports)",
+    )
+    conv_parser.add_argument(
+        "--on-conflict",
+        choices=["error", "skip", "replace"],
+        default="error",
+        help="Handling of message ids that are already stored",
+    )
     conv_parser.set_defaults(func=add_conversation_cmd)
 
     # Get conversation command
@@ -181,8 +230,27 @@ def main():
     get_parser.add_argument(
         "--limit", type=int, default=100, help="Maximum number of messages"
     )
+    get_parser.add_argument(
+        "--after-timestamp", help="Continue after this timestamp (next page)"
+    )
+    get_parser.add_argument(
+        "--after-id", help="Message id of the last message already seen"
+    )
+    get_parser.add_argument("--since", help="Only messages at or after this time")
+    get_parser.add_argument("--until", help="Only messages before this time")
     get_parser.set_defaults(func=get_conversation_cmd)
 
+    # Export command
+    export_parser = subparsers.add_parser(
+        "export", help="Stream messages as JSON lines"
+    )
+    export_parser.add_argument("user_id", help="User ID")
+    export_parser.add_argument("--conversation-id", help="Conversation ID")
+    export_parser.add_argument(
+        "--batch-size", type=int, default=1000, help="Messages read per query"
+    )
+    export_parser.set_defaults(func=export_cmd)
+
     # Search similar command
     similar_parser = subparsers.add_parser(
         "search-similar", help="Search for similar messages"
@@ -210,6 +278,15 @@ def main():
     stats_parser.add_argument("user_id", help="User ID")
     stats_parser.set_defaults(func=stats_cmd)
 
+    # Rebuild index command
+    rebuild_parser = subparsers.add_parser(
+        "rebuild-index", help="Rebuild the vector index from stored embeddings"
+    )
+    rebuild_parser.add_argument(
+        "--batch-size", type=int, default=1000, help="Messages indexed per batch"
+    )
+    rebuild_parser.set_defaults(func=rebuild_index_cmd)
+
     args = parser.parse_args()
 
     if not args.command:
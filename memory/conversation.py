@@ -1,15 +1,97 @@
 from __future__ import annotations
 
 import json
-from dataclasses import dataclass, asdict
+import re
+import sqlite3
+import threading
+import uuid
+from dataclasses import dataclass, asdict, replace
 from datetime import datetime
 from pathlib import Path
-from typing import List, Optional, Dict, Any, Tuple
+from typing import Iterable, Iterator, List, Optional, Dict, Any, Tuple
 import numpy as np
-from sentence_transformers import SentenceTransformer
 
-from .store import SQLiteStore
-from .vectors import create_vector_store, BaseVectorStore
+from .embedders import Embedder, ProcessPoolEmbedder
+from .embedders.bucketing import DEFAULT_TOKEN_BUDGET, encode_bucketed
+from .embedders.sentence_transformer import SentenceTransformerEmbedder
+from .embedding_cache import EmbeddingCache, content_hash
+from .query_cache import QueryEmbeddingCache
+from .store import SQLiteStore, UnitOfWork
+from .vectors import (
+    create_vector_store,
+    BaseVectorStore,
+    SearchFilter,
+    timestamp_to_epoch,
+)
+
+# Word tokens of a content query, each turned into an FTS5 prefix term
+_FTS_TOKEN = re.compile(r"\w+")
+
+# Bulk encodes of at least this many new texts go to the process pool
+_POOL_MIN_TEXTS = 256
+
+# Rank offset in reciprocal-rank fusion (the usual constant from Cormack et al.)
+_RRF_K = 60
+
+# Accepted ``on_conflict`` policies of ``add_message(s)``
+_ON_CONFLICT = ("error", "skip", "replace")
+
+# Rows converted per batch when backfilling ``timestamp_us``
+_BACKFILL_BATCH = 10_000
+
+# Applied intent batches collected before they are retired, together, in
+# the next write's transaction
+_RETIRE_BATCHES = 64
+
+# Inserts shared by the write paths. Embedding and intent rows are written
+# with ``SELECT`` so ``_IF_CHANGED`` can make them conditional.
+_INSERT_MESSAGE = """
+    INSERT INTO messages (user_id, message_id, content, role, timestamp,
+                          conversation_id, metadata_json, embedding_path,
+                          timestamp_us)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+_UPSERT_MESSAGE = (
+    _INSERT_MESSAGE
+    + """
+    ON CONFLICT (message_id) DO UPDATE SET
+        user_id = excluded.user_id,
+        content = excluded.content,
+        role = excluded.role,
+        timestamp = excluded.timestamp,
+        conversation_id = excluded.conversation_id,
+        metadata_json = excluded.metadata_json,
+        embedding_path = excluded.embedding_path,
+        timestamp_us = excluded.timestamp_us
+"""
+)
+_INSERT_NEW_MESSAGE = _INSERT_MESSAGE + "ON CONFLICT (message_id) DO NOTHING"
+_INSERT_EMBEDDING = """
+    INSERT OR REPLACE INTO message_embeddings
+        (message_id, embedding, content_hash, model_id)
+    SELECT ?, ?, ?, ?
+"""
+_INSERT_INTENT = """
+    INSERT INTO vector_intents (batch_id, op, message_id, user_id)
+    SELECT ?, ?, ?, ?
+"""
+# Only insert if the previous statement changed a row (triggers aside)
+_IF_CHANGED = "WHERE changes() > 0"
+
+
+def _epoch_us(timestamp: str) -> int:
+    """Microseconds since the Unix epoch of an ISO-8601 timestamp (naive
+    means UTC); raises ``ValueError`` if it cannot be parsed."""
+    return round(timestamp_to_epoch(timestamp) * 1_000_000)
+
+
+def _timestamp_key(timestamp: str) -> int:
+    """Value of the ``timestamp_us`` column: unparseable timestamps sort as
+    the epoch itself."""
+    try:
+        return _epoch_us(timestamp)
+    except ValueError:
+        return 0
 
 
 @dataclass(frozen=True)
@@ -46,20 +128,77 @@ class ConversationMemory:
         db_path: str = "cortex.db",
         vector_dir: str = "vectors",
         vector_backend: str = "faiss",
+        embedding_cache_size: int = 10_000,
+        device: Optional[str] = None,
+        embedder: Optional[Embedder] = None,
+        embedding_token_budget: int = DEFAULT_TOKEN_BUDGET,
+        workers: int = 0,
+        query_cache_size: int = 1024,
+        query_cache_bytes: int = 16 * 1024 * 1024,
+        query_cache_ttl: Optional[float] = 300.0,
+        readers: int = 0,
+        group_commit_ms: Optional[float] = None,
         **vector_kwargs,
     ) -> None:
-        self.store = SQLiteStore(db_path)
+        # readers > 0 serves reads from a pool of WAL reader connections;
+        # group_commit_ms batches concurrent writers' commits together
+        self.store = SQLiteStore(
+            db_path, readers=readers, group_commit_ms=group_commit_ms
+        )
 
-        # Initialize sentence transformer for embeddings
-        self.embedding_model = SentenceTransformer("all-MiniLM-L6-v2")
-        self.embedding_dim = 384  # Dimension for all-MiniLM-L6-v2
+        # Defaults to a sentence transformer that is loaded on first use, so
+        # callers that never embed (listing, stats, content search) skip it.
+        # Instances using the same model and device share one copy.
+        self._owns_embedder = embedder is None
+        self.embedder = embedder or SentenceTransformerEmbedder(device=device)
+        self.embedding_dim = self.embedder.dimension
+        # Bulk encodes run in length-sorted batches of about this many
+        # padded tokens
+        self.embedding_token_budget = embedding_token_budget
+        # Bulk ingestion is spread over worker processes when workers > 0
+        self._pool_embedder = (
+            ProcessPoolEmbedder(
+                self.embedder, workers=workers, token_budget=embedding_token_budget
+            )
+            if workers
+            else None
+        )
+
+        # Embeddings of previously seen text: stored message embeddings by
+        # content hash + model, fronted by an LRU
+        self.embedding_cache = EmbeddingCache(
+            self.store, self.embedder.model_id, max_entries=embedding_cache_size
+        )
+
+        # Recent query vectors, so repeated searches skip embedding entirely
+        self.query_cache = QueryEmbeddingCache(
+            max_entries=query_cache_size,
+            max_bytes=query_cache_bytes,
+            ttl_seconds=query_cache_ttl,
+        )
 
         # Initialize vector store backend
         if vector_backend == "faiss":
             vector_kwargs.setdefault("vector_dir", vector_dir)
+        vector_kwargs.setdefault("dimension", self.embedding_dim)
         self.vector_store = create_vector_store(vector_backend, **vector_kwargs)
+        if self.vector_store.dimension != self.embedding_dim:
+            raise ValueError(
+                f"Embedder {self.embedder.model_id!r} produces "
+                f"{self.embedding_dim}-dimensional vectors but the vector store "
+                f"expects {self.vector_store.dimension}"
+            )
+
+        # Batch ids of intents whose vector writes are done but not yet synced
+        # and retired (see _retire_intents)
+        self._applied_batches: List[str] = []
+        self._applied_lock = threading.Lock()
 
         self._ensure_schema()
+        # Lossy indexes are rebuilt from the exact embeddings kept in SQLite
+        self.vector_store.vector_source = self._stored_vectors
+        if not self.vector_store.read_only:
+            self.recover_pending_writes()
 
     def _ensure_schema(self) -> None:
         """Create the database schema for storing conversation messages."""
@@ -74,10 +213,12 @@ class ConversationMemory:
                 timestamp TEXT NOT NULL,
                 conversation_id TEXT,
                 metadata_json TEXT,
-                embedding_path TEXT
+                embedding_path TEXT,
+                timestamp_us INTEGER NOT NULL DEFAULT 0
             );
             """
         )
+        self._ensure_timestamp_us()
 
         # Create indexes for efficient querying
         self.store.execute(
@@ -101,102 +242,730 @@ class ConversationMemory:
             """
         )
 
+        # Time-range filters and ordering use the integer timestamp
+        self.store.execute(
+            """
+            CREATE INDEX IF NOT EXISTS idx_messages_user_epoch
+            ON messages (user_id, timestamp_us);
+            """
+        )
+
+        self.store.execute(
+            """
+            CREATE INDEX IF NOT EXISTS idx_messages_conversation_epoch
+            ON messages (conversation_id, timestamp_us);
+            """
+        )
+
+        # Raw float32 embeddings, so the vector index can be rebuilt without
+        # re-running the embedding model. The content hash and model id make
+        # them double as the embedding cache
+        self.store.execute(
+            """
+            CREATE TABLE IF NOT EXISTS message_embeddings (
+                message_id TEXT PRIMARY KEY
+                    REFERENCES messages (message_id) ON DELETE CASCADE,
+                embedding BLOB NOT NULL,
+                content_hash TEXT,
+                model_id TEXT
+            ) WITHOUT ROWID;
+            """
+        )
+        self.store.execute(
+            """
+            CREATE INDEX IF NOT EXISTS idx_message_embeddings_content
+            ON message_embeddings (content_hash, model_id);
+            """
+        )
+
+        # Intent log for the two-phase SQLite -> vector store write: rows are
+        # committed with the SQLite change and removed once the vector store
+        # has applied it, so leftovers after a crash mark unfinished writes
+        self.store.execute(
+            """
+            CREATE TABLE IF NOT EXISTS vector_intents (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                batch_id TEXT NOT NULL,
+                op TEXT NOT NULL,
+                message_id TEXT NOT NULL,
+                user_id TEXT NOT NULL
+            );
+            """
+        )
+        self.store.execute(
+            """
+            CREATE INDEX IF NOT EXISTS idx_vector_intents_batch
+            ON vector_intents (batch_id);
+            """
+        )
+
+        self._fts_enabled = self._ensure_fts()
+
+    def _ensure_timestamp_us(self) -> None:
+        """Add the ``timestamp_us`` column (microseconds since the epoch) to
+        databases created before it existed, filled from ``timestamp``."""
+        columns = {
+            row["name"] for row in self.store.query_all("PRAGMA table_info(messages)")
+        }
+        if "timestamp_us" in columns:
+            return
+
+        with self.store.transaction():
+            self.store.execute(
+                """
+                ALTER TABLE messages
+                ADD COLUMN timestamp_us INTEGER NOT NULL DEFAULT 0
+                """
+            )
+            last_id = 0
+            while True:
+                rows = self.store.query_all(
+                    "SELECT id, timestamp FROM messages WHERE id > ? ORDER BY id LIMIT ?",
+                    [last_id, _BACKFILL_BATCH],
+                )
+                if not rows:
+                    break
+                self.store.executemany(
+                    "UPDATE messages SET timestamp_us = ? WHERE id = ?",
+                    [(_timestamp_key(row["timestamp"]), row["id"]) for row in rows],
+                )
+                last_id = rows[-1]["id"]
+
+    def _ensure_fts(self) -> bool:
+        """Create the FTS5 index over message content and its sync triggers.
+
+        ``messages_fts`` is an external-content table: it indexes
+        ``messages.content`` by rowid without storing a second copy. Databases
+        created before it existed are backfilled once. Returns ``False`` when
+        SQLite was built without FTS5, in which case content search falls back
+        to ``LIKE``.
+        """
+        existed = self.store.query_one(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'messages_fts'"
+        )
+        try:
+            self.store.execute(
+                """
+                CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+                    content,
+                    content='messages',
+                    content_rowid='id',
+                    tokenize='unicode61 remove_diacritics 2'
+                );
+                """
+            )
+        except sqlite3.OperationalError:
+            return False
+
+        self.store.execute(
+            """
+            CREATE TRIGGER IF NOT EXISTS messages_fts_insert
+            AFTER INSERT ON messages BEGIN
+                INSERT INTO messages_fts (rowid, content)
+                VALUES (new.id, new.content);
+            END;
+            """
+        )
+        self.store.execute(
+            """
+            CREATE TRIGGER IF NOT EXISTS messages_fts_delete
+            AFTER DELETE ON messages BEGIN
+                INSERT INTO messages_fts (messages_fts, rowid, content)
+                VALUES ('delete', old.id, old.content);
+            END;
+            """
+        )
+        self.store.execute(
+            """
+            CREATE TRIGGER IF NOT EXISTS messages_fts_update
+            AFTER UPDATE OF content ON messages BEGIN
+                INSERT INTO messages_fts (messages_fts, rowid, content)
+                VALUES ('delete', old.id, old.content);
+                INSERT INTO messages_fts (rowid, content)
+                VALUES (new.id, new.content);
+            END;
+            """
+        )
+
+        if not existed:
+            # One-off backfill of messages stored before the index existed
+            self.store.execute(
+                "INSERT INTO messages_fts (messages_fts) VALUES ('rebuild')"
+            )
+        return True
+
     def _get_embedding(self, text: str) -> np.ndarray:
         """Generate embedding for text using sentence transformer."""
-        embedding = self.embedding_model.encode([text], convert_to_tensor=False)
-        return embedding.astype(np.float32)
+        return self._encode([text])
 
-    def add_message(self, message: Message) -> str:
-        """Add a single message to the conversation memory."""
-        # Generate embedding
-        embedding = self._get_embedding(message.content)
+    def _embed_query(self, query: str) -> np.ndarray:
+        """Embedding of a search query, served from the query cache if
+        possible."""
+        embedding = self.query_cache.get(query)
+        if embedding is None:
+            embedding = self._get_embedding(query)
+            self.query_cache.put(query, embedding)
+        return embedding
 
-        # Add to vector store
-        self.vector_store.add_vectors(
-            vectors=embedding.reshape(1, -1), ids=[message.message_id]
+    def _encode(self, texts: List[str], bulk: bool = False) -> np.ndarray:
+        """Embed ``texts`` (shape ``(n, dim)``), encoding only uncached text
+        in length-bucketed batches. ``bulk`` encodes may use the process
+        pool."""
+        embeddings = np.zeros((len(texts), self.embedding_dim), dtype=np.float32)
+        missing: Dict[str, List[int]] = {}
+        for i, cached in enumerate(self.embedding_cache.get_many(texts)):
+            if cached is None:
+                missing.setdefault(texts[i], []).append(i)
+            else:
+                embeddings[i] = cached
+
+        if missing:
+            unique = list(missing)
+            if bulk and self._pool_embedder and len(unique) >= _POOL_MIN_TEXTS:
+                encoded = self._pool_embedder.encode(unique)
+            else:
+                encoded = encode_bucketed(
+                    self.embedder, unique, token_budget=self.embedding_token_budget
+                )
+            for text, embedding in zip(unique, encoded):
+                embeddings[missing[text]] = embedding
+            self.embedding_cache.put_many(unique, encoded)
+
+        return embeddings
+
+    def _embedding_path(self, message_id: str) -> str:
+        """Locator of a message's stored embedding (``messages.embedding_path``)."""
+        return f"message_embeddings/{message_id}"
+
+    def _write_messages(
+        self, messages: List[Message], embeddings: np.ndarray, replace: bool = False
+    ) -> UnitOfWork:
+        """Message rows and their embeddings, as one unit of work.
+
+        With ``replace`` an already stored message is updated in place (so
+        the FTS triggers see an update) instead of failing the insert.
+        """
+        uow = self.store.unit_of_work()
+        uow.executemany(
+            _UPSERT_MESSAGE if replace else _INSERT_MESSAGE,
+            [self._message_row(msg) for msg in messages],
         )
+        self._write_embeddings(uow, messages, embeddings)
+        return uow
 
-        # Save embedding path (for future reference)
-        embedding_path = f"embeddings/{message.message_id}.npy"
+    def _write_new_messages(
+        self, messages: List[Message], embeddings: np.ndarray
+    ) -> Tuple[UnitOfWork, str]:
+        """Like ``_write_messages`` plus ``_log_intents``, but a message whose
+        id is already stored (possibly by a concurrent writer) is skipped.
 
-        # Store in SQLite
-        cur = self.store.execute(
-            """
-            INSERT INTO messages (user_id, message_id, content, role, timestamp, 
-                                conversation_id, metadata_json, embedding_path)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            """,
+        Each message's embedding and "add" intent are only written if its
+        insert changed a row, so the intents of the returned batch id name
+        exactly the messages that were stored.
+        """
+        batch_id = uuid.uuid4().hex
+        model_id = self.embedder.model_id
+        uow = self.store.unit_of_work()
+        for msg, emb in zip(messages, embeddings):
+            uow.execute(_INSERT_NEW_MESSAGE, self._message_row(msg))
+            uow.execute(
+                _INSERT_EMBEDDING + _IF_CHANGED,
+                self._embedding_row(msg, emb, model_id),
+            )
+            uow.execute(
+                _INSERT_INTENT + _IF_CHANGED,
+                [batch_id, "add", msg.message_id, msg.user_id],
+            )
+        return uow, batch_id
+
+    def _message_row(self, msg: Message) -> List[Any]:
+        """Parameters of a ``messages`` insert for ``msg``."""
+        return [
+            msg.user_id,
+            msg.message_id,
+            msg.content,
+            msg.role,
+            msg.timestamp,
+            msg.conversation_id,
+            msg.metadata_json,
+            self._embedding_path(msg.message_id),
+            _timestamp_key(msg.timestamp),
+        ]
+
+    def _embedding_row(
+        self, msg: Message, embedding: np.ndarray, model_id: str
+    ) -> List[Any]:
+        """Parameters of a ``message_embeddings`` insert for ``msg``."""
+        return [
+            msg.message_id,
+            np.ascontiguousarray(embedding, dtype=np.float32).tobytes(),
+            content_hash(msg.content),
+            model_id,
+        ]
+
+    def _write_embeddings(
+        self, uow: UnitOfWork, messages: List[Message], embeddings: np.ndarray
+    ) -> None:
+        """Persist embeddings as float32 BLOBs next to their messages, keyed
+        by content hash and model for the embedding cache."""
+        model_id = self.embedder.model_id
+        uow.executemany(
+            _INSERT_EMBEDDING,
             [
-                message.user_id,
-                message.message_id,
-                message.content,
-                message.role,
-                message.timestamp,
-                message.conversation_id,
-                message.metadata_json,
-                embedding_path,
+                self._embedding_row(msg, emb, model_id)
+                for msg, emb in zip(messages, embeddings)
             ],
         )
 
+    def _log_intents(self, uow: UnitOfWork, rows: List[Tuple[str, str, str]]) -> str:
+        """Record pending vector writes, ``(op, message_id, user_id)`` rows
+        with op "add" or "delete", in ``uow``; returns the batch id that
+        retires them."""
+        batch_id = uuid.uuid4().hex
+        uow.executemany(_INSERT_INTENT, [(batch_id, *row) for row in rows])
+        return batch_id
+
+    def _retire_intents(self, batch_id: str) -> None:
+        """Mark a batch's vector writes as applied.
+
+        Nothing is written yet: applied batches are retired together by a
+        later ``_commit`` (or ``close``) once the vector store has synced, so
+        a write costs one commit and an intent never outlives its vectors'
+        durability. Until then a crash only replays them.
+        """
+        with self._applied_lock:
+            self._applied_batches.append(batch_id)
+
+    def _commit(self, uow: UnitOfWork) -> None:
+        """Commit ``uow``, retiring the applied intent batches in the same
+        transaction once ``_RETIRE_BATCHES`` of them have collected."""
+        with self._applied_lock:
+            batches = []
+            if len(self._applied_batches) >= _RETIRE_BATCHES:
+                batches, self._applied_batches = self._applied_batches, []
+        if batches:
+            self.vector_store.sync()
+            uow.executemany(
+                "DELETE FROM vector_intents WHERE batch_id = ?",
+                [(batch_id,) for batch_id in batches],
+            )
+        try:
+            uow.commit()
+        except BaseException:
+            with self._applied_lock:
+                self._applied_batches[:0] = batches
+            raise
+
+    def _flush_intents(self) -> None:
+        """Sync the vector store and retire every applied intent batch."""
+        with self._applied_lock:
+            batches, self._applied_batches = self._applied_batches, []
+        if batches:
+            self.vector_store.sync()
+            self.store.unit_of_work().executemany(
+                "DELETE FROM vector_intents WHERE batch_id = ?",
+                [(batch_id,) for batch_id in batches],
+            ).commit()
+
+    def recover_pending_writes(self) -> int:
+        """Finish vector writes interrupted by a crash or error.
+
+        Every message named in the intent log is brought in line with
+        SQLite: messages that still exist are (re-)added from their stored
+        embeddings (re-adding an id replaces it, so this is idempotent), and
+        vectors are removed from namespaces that no longer own the message
+        (it was deleted, or replaced under another user). Runs on open;
+        returns the number of intents resolved.
+        """
+        intents = self.store.query_all(
+            "SELECT id, op, message_id, user_id FROM vector_intents ORDER BY id"
+        )
+        if not intents:
+            return 0
+
+        rows = self._rows_with_embeddings([i["message_id"] for i in intents])
+        if rows:
+            stride = self.embedding_dim * np.dtype(np.float32).itemsize
+            stale = [
+                i
+                for i, row in enumerate(rows)
+                if row["embedding"] is None or len(row["embedding"]) != stride
+            ]
+            fresh = self._encode([rows[i]["content"] for i in stale], bulk=True)
+            embeddings = np.zeros((len(rows), self.embedding_dim), dtype=np.float32)
+            for i, row in enumerate(rows):
+                if row["embedding"] is not None and len(row["embedding"]) == stride:
+                    embeddings[i] = np.frombuffer(row["embedding"], dtype=np.float32)
+            embeddings[stale] = fresh
+            self._add_to_vector_store(
+                [self._row_to_message(row) for row in rows], embeddings
+            )
+
+        owners = {row["message_id"]: row["user_id"] for row in rows}
+        gone: Dict[str, List[str]] = {}
+        for intent in intents:
+            if owners.get(intent["message_id"]) != intent["user_id"]:
+                gone.setdefault(intent["user_id"], []).append(intent["message_id"])
+        for user_id, message_ids in gone.items():
+            self.vector_store.delete_vectors(
+                list(dict.fromkeys(message_ids)), namespace=user_id
+            )
+
+        self.vector_store.sync()
+        self.store.execute(
+            "DELETE FROM vector_intents WHERE id <= ?", [intents[-1]["id"]]
+        )
+        return len(intents)
+
+    def _stored_vectors(self, message_ids: List[str]) -> Dict[str, np.ndarray]:
+        """Stored embeddings of ``message_ids`` (the ones that have one)."""
+        rows = self.store.query_in(
+            """
+            SELECT message_id, embedding FROM message_embeddings
+            WHERE message_id IN ({placeholders})
+            """,
+            message_ids,
+        )
+        return {
+            row["message_id"]: np.frombuffer(row["embedding"], dtype=np.float32)
+            for row in rows
+        }
+
+    def _rows_with_embeddings(self, message_ids: List[str]) -> List[sqlite3.Row]:
+        """Message rows joined with their stored embeddings, by id."""
+        return self.store.query_in(
+            """
+            SELECT m.user_id, m.message_id, m.content, m.role, m.timestamp,
+                   m.conversation_id, m.metadata_json, e.embedding
+            FROM messages m
+            LEFT JOIN message_embeddings e ON e.message_id = m.message_id
+            WHERE m.message_id IN ({placeholders})
+            """,
+            message_ids,
+        )
+
+    def _add_to_vector_store(
+        self, messages: List[Message], embeddings: np.ndarray
+    ) -> None:
+        """Add embeddings to the vector store, one call per user namespace."""
+        by_user: Dict[str, List[int]] = {}
+        for i, msg in enumerate(messages):
+            by_user.setdefault(msg.user_id, []).append(i)
+
+        for user_id, positions in by_user.items():
+            self.vector_store.add_vectors(
+                vectors=embeddings[positions],
+                ids=[messages[i].message_id for i in positions],
+                namespace=user_id,
+                metadata=[self._vector_metadata(messages[i]) for i in positions],
+            )
+
+    def _vector_metadata(self, message: Message) -> Dict[str, Any]:
+        """Metadata stored alongside a vector (for backends that keep it)."""
+        metadata = {
+            "user_id": message.user_id,
+            "role": message.role,
+            "timestamp": message.timestamp,
+        }
+        if message.conversation_id is not None:
+            metadata["conversation_id"] = message.conversation_id
+        try:
+            # Numeric copy of the timestamp for backends with range filters
+            metadata["timestamp_epoch"] = timestamp_to_epoch(message.timestamp)
+        except ValueError:
+            pass
+        return metadata
+
+    def add_message(self, message: Message, on_conflict: str = "error") -> str:
+        """Add a single message to the conversation memory.
+
+        ``on_conflict`` handles an already stored ``message_id`` as in
+        ``add_messages``.
+        """
+        messages, owners = self._resolve_conflicts([message], on_conflict)
+        if messages:
+            # Generate embedding
+            embedding = self._get_embedding(message.content)
+            self._write_through(
+                messages,
+                embedding.reshape(1, -1),
+                owners,
+                skip=on_conflict == "skip",
+            )
+
         return message.message_id
 
-    def add_messages(self, messages: List[Message]) -> List[str]:
-        """Add multiple messages to the conversation memory."""
+    def add_messages(
+        self, messages: List[Message], on_conflict: str = "error"
+    ) -> List[str]:
+        """Add multiple messages to the conversation memory.
+
+        Parameters
+        - messages: Messages to store.
+        - on_conflict: What to do with a ``message_id`` that is already
+          stored or repeated in the batch: ``"error"`` raises
+          ``sqlite3.IntegrityError`` and stores nothing, ``"skip"`` keeps the
+          stored message, ``"replace"`` overwrites it. Stored ids are looked
+          up before encoding, so duplicates are never embedded. ``"skip"``
+          also tolerates ids stored concurrently after that lookup.
+
+        Returns the ids of the messages written (skipped ones are left out).
+        """
+        messages, owners = self._resolve_conflicts(messages, on_conflict)
         if not messages:
             return []
 
         # Generate embeddings for all messages
-        contents = [msg.content for msg in messages]
-        embeddings = self.embedding_model.encode(contents, convert_to_tensor=False)
-        embeddings = embeddings.astype(np.float32)
+        embeddings = self._encode([msg.content for msg in messages], bulk=True)
 
-        # Add to vector store
-        message_ids = [msg.message_id for msg in messages]
-        self.vector_store.add_vectors(vectors=embeddings, ids=message_ids)
+        return self._write_through(
+            messages, embeddings, owners, skip=on_conflict == "skip"
+        )
+
+    def upsert_messages(self, messages: List[Message]) -> List[str]:
+        """Add messages, replacing any already stored under the same id."""
+        return self.add_messages(messages, on_conflict="replace")
+
+    def _resolve_conflicts(
+        self, messages: List[Message], on_conflict: str
+    ) -> Tuple[List[Message], Optional[Dict[str, str]]]:
+        """Apply an ``on_conflict`` policy to messages about to be added.
+
+        Returns the messages to write and, for ``"replace"`` only, the
+        current owner (user id) of each stored message being overwritten.
+        """
+        if on_conflict not in _ON_CONFLICT:
+            raise ValueError(
+                f"on_conflict must be one of {', '.join(_ON_CONFLICT)}, "
+                f"got {on_conflict!r}"
+            )
+
+        unique: Dict[str, Message] = {}
+        for msg in messages:
+            if msg.message_id in unique:
+                if on_conflict == "error":
+                    raise sqlite3.IntegrityError(
+                        f"message_id {msg.message_id!r} is repeated in the batch"
+                    )
+                if on_conflict == "skip":
+                    continue
+            # Under "replace" the last copy wins
+            unique[msg.message_id] = msg
+
+        owners = self._stored_owners(list(unique))
+        if on_conflict == "replace":
+            return list(unique.values()), owners
+        if owners and on_conflict == "error":
+            raise sqlite3.IntegrityError(
+                f"message_id {next(iter(owners))!r} is already stored"
+            )
+        return [m for m in unique.values() if m.message_id not in owners], None
 
-        # Prepare data for SQLite
-        params = [
+    def _stored_owners(self, message_ids: List[str]) -> Dict[str, str]:
+        """User id of each of ``message_ids`` that is already stored."""
+        rows = self.store.query_in(
+            "SELECT message_id, user_id FROM messages "
+            "WHERE message_id IN ({placeholders})",
+            message_ids,
+        )
+        return {row["message_id"]: row["user_id"] for row in rows}
+
+    def _write_through(
+        self,
+        messages: List[Message],
+        embeddings: np.ndarray,
+        replaced: Optional[Dict[str, str]] = None,
+        skip: bool = False,
+    ) -> List[str]:
+        """Two-phase write of messages to SQLite and the vector store.
+
+        Phase one commits the messages, their embeddings and an "add" intent
+        in one SQLite transaction, so a duplicate id fails before any vector
+        is written. Phase two updates the vectors and retires the intent; if
+        it fails or the process dies first, ``recover_pending_writes``
+        finishes it. ``replaced`` maps ids being overwritten to their
+        current owner (``None`` for plain inserts); old vectors are removed
+        when the owner changes. With ``skip`` already stored ids are left
+        alone; returns the ids actually written.
+        """
+        if skip:
+            uow, batch_id = self._write_new_messages(messages, embeddings)
+            self._commit(uow)
+            added = {
+                row["message_id"]
+                for row in self.store.query_all(
+                    "SELECT message_id FROM vector_intents WHERE batch_id = ?",
+                    [batch_id],
+                )
+            }
+            keep = [i for i, msg in enumerate(messages) if msg.message_id in added]
+            messages = [messages[i] for i in keep]
+            self._add_to_vector_store(messages, embeddings[keep])
+            self._retire_intents(batch_id)
+            return [msg.message_id for msg in messages]
+
+        moved: Dict[str, List[str]] = {}
+        for msg in messages:
+            owner = (replaced or {}).get(msg.message_id)
+            if owner is not None and owner != msg.user_id:
+                moved.setdefault(owner, []).append(msg.message_id)
+
+        uow = self._write_messages(messages, embeddings, replace=replaced is not None)
+        batch_id = self._log_intents(
+            uow,
             [
-                msg.user_id,
-                msg.message_id,
-                msg.content,
-                msg.role,
-                msg.timestamp,
-                msg.conversation_id,
-                msg.metadata_json,
-                f"embeddings/{msg.message_id}.npy",
+                ("delete", message_id, owner)
+                for owner, message_ids in moved.items()
+                for message_id in message_ids
             ]
-            for msg in messages
-        ]
-
-        # Store in SQLite
-        self.store.executemany(
-            """
-            INSERT INTO messages (user_id, message_id, content, role, timestamp, 
-                                conversation_id, metadata_json, embedding_path)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            """,
-            params,
+            + [("add", msg.message_id, msg.user_id) for msg in messages],
         )
+        self._commit(uow)
+
+        for owner, message_ids in moved.items():
+            self.vector_store.delete_vectors(message_ids, namespace=owner)
+        self._add_to_vector_store(messages, embeddings)
+        self._retire_intents(batch_id)
+
+        return [msg.message_id for msg in messages]
+
+    def rebuild_vector_index(self, batch_size: int = 1000) -> int:
+        """Rebuild the vector index from the embeddings stored in SQLite.
+
+        The backend index is emptied and refilled in batches of
+        ``batch_size`` without re-running the embedding model. Messages
+        stored before embeddings were persisted, or whose stored embedding
+        has a different size than the current embedder's, are encoded once
+        and their embeddings saved. Returns the number of messages indexed.
+        """
+        self.vector_store.clear()
+
+        stride = self.embedding_dim * np.dtype(np.float32).itemsize
+        rebuilt = 0
+        last_id = 0
+        while True:
+            rows = self.store.query_all(
+                """
+                SELECT m.id, m.user_id, m.message_id, m.content, m.role,
+                       m.timestamp, m.conversation_id, m.metadata_json,
+                       e.embedding
+                FROM messages m
+                LEFT JOIN message_embeddings e ON e.message_id = m.message_id
+                WHERE m.id > ?
+                ORDER BY m.id
+                LIMIT ?
+                """,
+                [last_id, batch_size],
+            )
+            if not rows:
+                break
+            last_id = rows[-1]["id"]
 
-        return message_ids
+            messages = [self._row_to_message(row) for row in rows]
+            embeddings = np.zeros((len(rows), self.embedding_dim), dtype=np.float32)
+            missing = []
+            for i, row in enumerate(rows):
+                # Embeddings of another size predate a change of embedder
+                if row["embedding"] is None or len(row["embedding"]) != stride:
+                    missing.append(i)
+                else:
+                    embeddings[i] = np.frombuffer(row["embedding"], dtype=np.float32)
+
+            if missing:
+                backfill = [messages[i] for i in missing]
+                encoded = self._encode([msg.content for msg in backfill], bulk=True)
+                embeddings[missing] = encoded
+                with self.store.unit_of_work() as uow:
+                    self._write_embeddings(uow, backfill, encoded)
+                    uow.executemany(
+                        "UPDATE messages SET embedding_path = ? WHERE message_id = ?",
+                        [
+                            (self._embedding_path(m.message_id), m.message_id)
+                            for m in backfill
+                        ],
+                    )
+
+            self._add_to_vector_store(messages, embeddings)
+            rebuilt += len(rows)
+
+        # The rebuilt index reflects SQLite, so nothing is left pending
+        self.vector_store.sync()
+        self.store.execute("DELETE FROM vector_intents")
+        self.vector_store.compact()
+        return rebuilt
 
     def search_similar(
-        self, user_id: str, query: str, limit: int = 10
+        self,
+        user_id: str,
+        query: str,
+        limit: int = 10,
+        role: Optional[str] = None,
+        conversation_ids: Optional[Iterable[str]] = None,
+        exclude_conversation_ids: Optional[Iterable[str]] = None,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
     ) -> List[Tuple[Message, float]]:
-        """Search for messages similar to the query using vector similarity."""
+        """Search for messages similar to the query using vector similarity.
+
+        The optional filters (role, conversations to include or exclude, and
+        an ISO-8601 ``since``/``until`` range) are applied inside the vector
+        search, so up to ``limit`` matching messages are returned.
+        """
+        search_filter = None
+        if any(
+            value is not None
+            for value in (
+                role,
+                conversation_ids,
+                exclude_conversation_ids,
+                since,
+                until,
+            )
+        ):
+            search_filter = SearchFilter(
+                role=role,
+                conversation_ids=(
+                    frozenset(conversation_ids)
+                    if conversation_ids is not None
+                    else None
+                ),
+                exclude_conversation_ids=(
+                    frozenset(exclude_conversation_ids)
+                    if exclude_conversation_ids is not None
+                    else None
+                ),
+                since=since,
+                until=until,
+            )
+            if not self.vector_store.supports_metadata_filter:
+                search_filter = self._resolve_filter(user_id, search_filter)
+                if (
+                    search_filter is not None
+                    and search_filter.message_ids == frozenset()
+                ):
+                    return []
+
         # Generate query embedding
-        query_embedding = self._get_embedding(query)
+        query_embedding = self._embed_query(query)
 
-        # Search vector store
+        # Search vector store (partitioned stores only scan this user's vectors)
         similar_ids = self.vector_store.search_similar(
-            query_vector=query_embedding, k=limit
+            query_vector=query_embedding,
+            k=limit,
+            namespace=user_id,
+            filter=search_filter,
         )
 
-        # Retrieve messages from SQLite
+        # Retrieve all hits from SQLite in one query
+        messages = {
+            message.message_id: message
+            for message in self.get_messages_by_ids(
+                [message_id for message_id, _ in similar_ids]
+            )
+        }
         results = []
         for message_id, score in similar_ids:
-            message = self._get_message_by_id(message_id)
+            message = messages.get(message_id)
             if message and message.user_id == user_id:
                 results.append((message, score))
 
@@ -204,55 +973,375 @@ class ConversationMemory:
         results.sort(key=lambda x: x[1], reverse=True)
         return results[:limit]
 
+    def _filter_clause(self, search_filter: SearchFilter) -> Tuple[str, List[Any]]:
+        """SQL conditions (to AND onto a ``user_id = ?`` query) for a filter."""
+        clauses: List[str] = []
+        params: List[Any] = []
+
+        if search_filter.role is not None:
+            clauses.append("role = ?")
+            params.append(search_filter.role)
+        if search_filter.conversation_ids is not None:
+            ids = sorted(search_filter.conversation_ids)
+            clauses.append(f"conversation_id IN ({', '.join('?' * len(ids))})")
+            params.extend(ids)
+        if search_filter.exclude_conversation_ids:
+            ids = sorted(search_filter.exclude_conversation_ids)
+            clauses.append(
+                "(conversation_id IS NULL OR "
+                f"conversation_id NOT IN ({', '.join('?' * len(ids))}))"
+            )
+            params.extend(ids)
+        time_clause, time_params = self._time_clause(
+            search_filter.since, search_filter.until
+        )
+
+        return (
+            "".join(f" AND {clause}" for clause in clauses) + time_clause,
+            params + time_params,
+        )
+
+    def _time_clause(
+        self, since: Optional[str], until: Optional[str], column: str = "timestamp_us"
+    ) -> Tuple[str, List[Any]]:
+        """SQL conditions (to AND onto a query) for an ISO-8601 ``since``
+        (inclusive) / ``until`` (exclusive) range on the integer timestamp."""
+        clauses: List[str] = []
+        params: List[Any] = []
+        if since is not None:
+            clauses.append(f"{column} >= ?")
+            params.append(_epoch_us(since))
+        if until is not None:
+            clauses.append(f"{column} < ?")
+            params.append(_epoch_us(until))
+        return "".join(f" AND {clause}" for clause in clauses), params
+
+    def _resolve_filter(
+        self, user_id: str, search_filter: SearchFilter
+    ) -> Optional[SearchFilter]:
+        """Resolve a filter through the SQL indexes into message ids for
+        backends without metadata filtering.
+
+        On a store partitioned per user, a filter that only excludes
+        conversations becomes the (small) set of ids to skip, so it never
+        enumerates the user's whole history. Otherwise the filter becomes the
+        set of the user's ids to keep, since an exclusion alone would let
+        other users' vectors fill the top ``k`` of a shared index.
+        """
+        if (
+            self.vector_store.partitioned
+            and search_filter.role is None
+            and search_filter.conversation_ids is None
+            and search_filter.since is None
+            and search_filter.until is None
+        ):
+            if not search_filter.exclude_conversation_ids:
+                return None
+            rows = self.store.query_in(
+                "SELECT message_id FROM messages "
+                "WHERE conversation_id IN ({placeholders}) AND user_id = ?",
+                sorted(search_filter.exclude_conversation_ids),
+                [user_id],
+            )
+            return replace(
+                search_filter,
+                exclude_message_ids=frozenset(row["message_id"] for row in rows),
+            )
+        return replace(
+            search_filter,
+            message_ids=self._filter_message_ids(user_id, search_filter),
+        )
+
+    def _filter_message_ids(
+        self, user_id: str, search_filter: SearchFilter
+    ) -> frozenset:
+        """Ids of the user's messages matching a search filter."""
+        clause, params = self._filter_clause(search_filter)
+        rows = self.store.query_all(
+            f"SELECT message_id FROM messages WHERE user_id = ?{clause}",
+            [user_id, *params],
+        )
+        return frozenset(row["message_id"] for row in rows)
+
     def search_by_content(
-        self, user_id: str, query: str, limit: int = 50
+        self,
+        user_id: str,
+        query: str,
+        limit: int = 50,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
     ) -> List[Message]:
-        """Search for messages containing specific text content."""
-        results = self.store.query_all(
+        """Search for messages containing specific text content.
+
+        Every word of ``query`` must appear in the message (as a word or word
+        prefix); results are ranked by BM25 relevance, newest first on ties.
+        ``since`` (inclusive) and ``until`` (exclusive) restrict the search
+        to an ISO-8601 time range.
+        """
+        return [
+            message
+            for message, _ in self._search_content(user_id, query, limit, since, until)
+        ]
+
+    def search_by_content_with_snippets(
+        self,
+        user_id: str,
+        query: str,
+        limit: int = 50,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+    ) -> List[Tuple[Message, str]]:
+        """Like ``search_by_content`` but also returns a highlighted snippet.
+
+        Matched terms in the snippet are wrapped in ``[`` ``]``.
+        """
+        return self._search_content(user_id, query, limit, since, until)
+
+    def _fts_query(self, query: str) -> Optional[str]:
+        """Turn free text into an FTS5 query: an AND of quoted prefix terms."""
+        tokens = _FTS_TOKEN.findall(query)
+        if not tokens:
+            return None
+        return " ".join(f'"{token}"*' for token in tokens)
+
+    def _content_query(
+        self,
+        user_id: str,
+        query: str,
+        limit: int,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        ids_only: bool = False,
+    ) -> Optional[Tuple[str, List[Any]]]:
+        """SQL and parameters of a content search, best match first.
+
+        Rows are full messages plus a ``snippet`` column, or only
+        ``message_id`` with ``ids_only``. Returns ``None`` if ``query`` has
+        no words to match.
+        """
+        time_clause, time_params = self._time_clause(since, until, "m.timestamp_us")
+        if self._fts_enabled:
+            fts_query = self._fts_query(query)
+            if fts_query is None:
+                return None
+            source = """
+                messages_fts JOIN messages m ON m.id = messages_fts.rowid
+                WHERE messages_fts MATCH ? AND m.user_id = ?
             """
-            SELECT user_id, message_id, content, role, timestamp, 
-                   conversation_id, metadata_json
-            FROM messages 
-            WHERE user_id = ? AND content LIKE ?
-            ORDER BY timestamp DESC
+            params: List[Any] = [fts_query, user_id]
+            snippet = "snippet(messages_fts, 0, '[', ']', '...', 16)"
+            order = "bm25(messages_fts), m.timestamp_us DESC"
+        else:
+            source = "messages m WHERE m.user_id = ? AND m.content LIKE ?"
+            params = [user_id, f"%{query}%"]
+            snippet = "m.content"
+            order = "m.timestamp_us DESC"
+
+        columns = (
+            "m.message_id"
+            if ids_only
+            else "m.user_id, m.message_id, m.content, m.role, m.timestamp, "
+            f"m.conversation_id, m.metadata_json, {snippet} AS snippet"
+        )
+        return (
+            f"""
+            SELECT {columns}
+            FROM {source}{time_clause}
+            ORDER BY {order}
             LIMIT ?
             """,
-            [user_id, f"%{query}%", limit],
+            params + time_params + [limit],
         )
 
-        return [self._row_to_message(row) for row in results]
+    def _search_content(
+        self,
+        user_id: str,
+        query: str,
+        limit: int,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+    ) -> List[Tuple[Message, str]]:
+        content_query = self._content_query(user_id, query, limit, since, until)
+        if content_query is None:
+            return []
+        results = self.store.query_all(*content_query)
+        return [(self._row_to_message(row), row["snippet"]) for row in results]
 
-    def get_conversation(
-        self, user_id: str, limit: int = 100, conversation_id: Optional[str] = None
-    ) -> List[Message]:
-        """Retrieve conversation messages for a user."""
-        if conversation_id:
-            results = self.store.query_all(
-                """
-                SELECT user_id, message_id, content, role, timestamp, 
-                       conversation_id, metadata_json
-                FROM messages 
-                WHERE user_id = ? AND conversation_id = ?
-                ORDER BY timestamp ASC
-                LIMIT ?
-                """,
-                [user_id, conversation_id, limit],
+    def _lexical_ids(self, user_id: str, query: str, limit: int) -> List[str]:
+        """Ids of the best ``search_by_content`` matches, without hydrating."""
+        content_query = self._content_query(user_id, query, limit, ids_only=True)
+        if content_query is None:
+            return []
+        return [row["message_id"] for row in self.store.query_all(*content_query)]
+
+    def search_hybrid(
+        self,
+        user_id: str,
+        query: str,
+        limit: int = 10,
+        weights: Tuple[float, float] = (1.0, 1.0),
+    ) -> List[Tuple[Message, float]]:
+        """Search with full-text and vector retrieval fused into one ranking.
+
+        Each side contributes ``weight / (60 + rank)`` per candidate
+        (weighted reciprocal-rank fusion), with ``weights`` given as
+        ``(lexical, semantic)``; a zero weight skips that retriever. The fused
+        hits are fetched from SQLite in a single query and returned best
+        first with their fused score.
+        """
+        lexical_weight, semantic_weight = weights
+        if lexical_weight < 0 or semantic_weight < 0:
+            raise ValueError("weights must be non-negative")
+
+        # Over-fetch so items ranked low by one retriever can still surface
+        candidates = max(limit * 3, 20)
+        rankings: List[Tuple[float, List[str]]] = []
+        if lexical_weight:
+            rankings.append(
+                (lexical_weight, self._lexical_ids(user_id, query, candidates))
             )
-        else:
-            results = self.store.query_all(
-                """
-                SELECT user_id, message_id, content, role, timestamp, 
-                       conversation_id, metadata_json
-                FROM messages 
-                WHERE user_id = ?
-                ORDER BY timestamp DESC
-                LIMIT ?
-                """,
-                [user_id, limit],
+        if semantic_weight:
+            similar_ids = self.vector_store.search_similar(
+                query_vector=self._embed_query(query),
+                k=candidates,
+                namespace=user_id,
             )
+            rankings.append(
+                (semantic_weight, [message_id for message_id, _ in similar_ids])
+            )
+
+        scores: Dict[str, float] = {}
+        for weight, ranked_ids in rankings:
+            for rank, message_id in enumerate(ranked_ids, start=1):
+                score = weight / (_RRF_K + rank)
+                scores[message_id] = scores.get(message_id, 0.0) + score
+
+        # Unpartitioned vector stores can return other users' messages
+        ranked = sorted(scores, key=scores.get, reverse=True)
+        results = [
+            (message, scores[message.message_id])
+            for message in self.get_messages_by_ids(ranked)
+            if message.user_id == user_id
+        ]
+        return results[:limit]
 
+    def get_conversation(
+        self,
+        user_id: str,
+        limit: int = 100,
+        conversation_id: Optional[str] = None,
+        after_timestamp: Optional[str] = None,
+        after_id: Optional[str] = None,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+    ) -> List[Message]:
+        """Retrieve conversation messages for a user.
+
+        Messages of one conversation come oldest first, a user's messages
+        across conversations newest first; ties are ordered by message id.
+        Pass the ``timestamp`` and ``message_id`` of the last message of a
+        page as ``after_timestamp`` / ``after_id`` to get the next page
+        (keyset pagination, so deep pages cost the same as the first).
+        ``after_timestamp`` alone continues strictly past that time.
+        ``since`` (inclusive) and ``until`` (exclusive) restrict the result to
+        an ISO-8601 time range.
+        """
+        if after_id is not None and after_timestamp is None:
+            raise ValueError("after_id requires after_timestamp")
+        results = self._conversation_page(
+            user_id,
+            conversation_id,
+            limit,
+            descending=not conversation_id,
+            after=(
+                (_timestamp_key(after_timestamp), after_id)
+                if after_timestamp is not None
+                else None
+            ),
+            since=since,
+            until=until,
+        )
         return [self._row_to_message(row) for row in results]
 
+    def iter_conversation(
+        self,
+        user_id: str,
+        conversation_id: Optional[str] = None,
+        batch_size: int = 1000,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+    ) -> Iterator[Message]:
+        """Stream a user's messages (or one conversation's) oldest first.
+
+        Rows are read in keyset-paginated batches of ``batch_size``, so
+        exporting or replaying a long history uses constant memory.
+        ``since``/``until`` restrict it to a time range as in
+        ``get_conversation``.
+        """
+        after: Optional[Tuple[int, Optional[str]]] = None
+        while True:
+            rows = self._conversation_page(
+                user_id,
+                conversation_id,
+                batch_size,
+                descending=False,
+                after=after,
+                since=since,
+                until=until,
+            )
+            for row in rows:
+                yield self._row_to_message(row)
+            if len(rows) < batch_size:
+                return
+            after = (rows[-1]["timestamp_us"], rows[-1]["message_id"])
+
+    def _conversation_page(
+        self,
+        user_id: str,
+        conversation_id: Optional[str],
+        limit: int,
+        descending: bool,
+        after: Optional[Tuple[int, Optional[str]]] = None,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+    ) -> List[sqlite3.Row]:
+        """One page of messages ordered by ``(timestamp_us, message_id)``,
+        starting past the ``after`` cursor (a message id of ``None``
+        continues strictly past the time)."""
+        clauses = ["user_id = ?"]
+        params: List[Any] = [user_id]
+        if conversation_id:
+            clauses.append("conversation_id = ?")
+            params.append(conversation_id)
+
+        if after is not None:
+            after_us, after_id = after
+            op = "<" if descending else ">"
+            if after_id is None:
+                clauses.append(f"timestamp_us {op} ?")
+                params.append(after_us)
+            else:
+                # The redundant range bound lets SQLite seek in the index
+                clauses.append(
+                    f"timestamp_us {op}= ? "
+                    f"AND (timestamp_us {op} ? OR message_id {op} ?)"
+                )
+                params.extend([after_us, after_us, after_id])
+
+        time_clause, time_params = self._time_clause(since, until)
+        order = "DESC" if descending else "ASC"
+        return self.store.query_all(
+            f"""
+            SELECT user_id, message_id, content, role, timestamp,
+                   conversation_id, metadata_json, timestamp_us
+            FROM messages
+            WHERE {' AND '.join(clauses)}{time_clause}
+            ORDER BY timestamp_us {order}, message_id {order}
+            LIMIT ?
+            """,
+            params + time_params + [limit],
+        )
+
     def get_user_stats(self, user_id: str) -> Dict[str, Any]:
         """Get statistics about a user's conversations."""
         # Total message count
@@ -296,33 +1385,48 @@ class ConversationMemory:
 
     def delete_user_messages(self, user_id: str) -> int:
         """Delete all messages for a user."""
-        # Get message IDs to delete from vector store
-        message_ids = self.store.query_all(
-            "SELECT message_id FROM messages WHERE user_id = ?", [user_id]
-        )
+        # Delete from SQLite together with a "delete" intent for the vectors
+        with self.store.transaction():
+            message_ids = [
+                row["message_id"]
+                for row in self.store.query_all(
+                    "SELECT message_id FROM messages WHERE user_id = ?", [user_id]
+                )
+            ]
+            uow = self.store.unit_of_work()
+            batch_id = self._log_intents(
+                uow, [("delete", message_id, user_id) for message_id in message_ids]
+            )
+            uow.execute("DELETE FROM messages WHERE user_id = ?", [user_id])
+            self._commit(uow)
 
         # Delete from vector store
-        for row in message_ids:
-            self.vector_store.delete_vector(row["message_id"])
+        if self.vector_store.partitioned:
+            self.vector_store.delete_namespace(user_id)
+        else:
+            self.vector_store.delete_vectors(message_ids, namespace=user_id)
+        self._retire_intents(batch_id)
 
-        # Delete from SQLite
-        cur = self.store.execute("DELETE FROM messages WHERE user_id = ?", [user_id])
+        return len(message_ids)
 
-        return cur.rowcount
+    def get_messages_by_ids(self, message_ids: Iterable[str]) -> List[Message]:
+        """Retrieve several messages by ID with one query per 500 ids.
 
-    def _get_message_by_id(self, message_id: str) -> Optional[Message]:
-        """Retrieve a message by its ID."""
-        row = self.store.query_one(
+        Messages are returned in the order of ``message_ids``; unknown ids are
+        skipped.
+        """
+        message_ids = list(dict.fromkeys(message_ids))
+        rows = self.store.query_in(
             """
-            SELECT user_id, message_id, content, role, timestamp, 
+            SELECT user_id, message_id, content, role, timestamp,
                    conversation_id, metadata_json
-            FROM messages 
-            WHERE message_id = ?
+            FROM messages
+            WHERE message_id IN ({placeholders})
             """,
-            [message_id],
+            message_ids,
         )
-
-        return self._row_to_message(row) if row else None
+        found = {row["message_id"]: self._row_to_message(row) for row in rows}
+        return [found[message_id] for message_id in message_ids if message_id in found]
 
     def _row_to_message(self, row) -> Message:
         """Convert a database row to a Message object."""
@@ -338,8 +1442,15 @@ class ConversationMemory:
 
     def close(self) -> None:
         """Close the conversation memory and clean up resources."""
-        self.store.close()
+        if not self.vector_store.read_only:
+            self._flush_intents()
+        # Background index rebuilds may still read embeddings from SQLite
         self.vector_store.close()
+        self.store.close()
+        if self._pool_embedder is not None:
+            self._pool_embedder.close()
+        if self._owns_embedder:
+            self.embedder.close()
 
     def __enter__(self):
         """Context manager entry."""
@@ -0,0 +1,39 @@
+"""Pluggable embedding backends for Cortex."""
+
+from __future__ import annotations
+
+from .base import Embedder
+from .batching import BatchingEmbedder
+from .bucketing import encode_bucketed
+from .process_pool import ProcessPoolEmbedder
+
+
+def create_embedder(backend: str = "sentence-transformers", **kwargs) -> Embedder:
+    """Instantiate an embedding backend by name.
+
+    - ``"sentence-transformers"``: PyTorch sentence-transformers model (see
+      ``SentenceTransformerEmbedder``)
+    - ``"onnx"``: ONNX Runtime, optionally int8-quantized, for CPU inference
+      (requires the ``onnx`` extra; see ``ONNXEmbedder``)
+
+    Keyword arguments are forwarded to the backend constructor, e.g.
+    ``create_embedder("onnx", model_dir="models/minilm", quantized=True)``.
+    """
+    if backend == "sentence-transformers":
+        from .sentence_transformer import SentenceTransformerEmbedder
+
+        return SentenceTransformerEmbedder(**kwargs)
+    if backend == "onnx":
+        from .onnx import ONNXEmbedder
+
+        return ONNXEmbedder(**kwargs)
+    raise ValueError(f"Unknown embedder backend: {backend!r}")
+
+
+__all__ = [
+    "BatchingEmbedder",
+    "Embedder",
+    "ProcessPoolEmbedder",
+    "create_embedder",
+    "encode_bucketed",
+]
@@ -0,0 +1,38 @@
+"""Interface shared by all embedding backends."""
+
+from __future__ import annotations
+
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+class Embedder(ABC):
+    """Turns text into fixed-size float32 vectors.
+
+    ``model_id`` identifies the model (and quantization) that produced an
+    embedding; it keys the embedding cache, so two embedders must only share
+    an id when they produce interchangeable vectors. ``dimension`` must be
+    known without running the model, because ``ConversationMemory`` checks it
+    against the vector store when it is opened.
+    """
+
+    model_id: str
+
+    @property
+    @abstractmethod
+    def dimension(self) -> int:
+        """Length of each embedding vector."""
+
+    @abstractmethod
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Embed ``texts`` into a float32 array of shape ``(n, dimension)``."""
+
+    def spec(self) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """``(backend, kwargs)`` from which ``create_embedder`` builds an
+        equivalent embedder in another process, or ``None`` if it can't."""
+        return None
+
+    def close(self) -> None:
+        """Release the model and any other resources."""
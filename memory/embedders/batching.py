@@ -0,0 +1,180 @@
+"""Micro-batching wrapper that coalesces concurrent embedding requests."""
+
+from __future__ import annotations
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .base import Embedder
+
+
+class _Request:
+    __slots__ = ("texts", "future")
+
+    def __init__(self, texts: List[str]) -> None:
+        self.texts = texts
+        self.future: Future = Future()
+
+
+class BatchingEmbedder(Embedder):
+    """Runs concurrent ``encode`` calls through the wrapped embedder together.
+
+    Callers block while a background thread gathers pending requests until
+    ``max_batch_size`` texts are queued or ``max_wait_ms`` has passed since
+    the first one arrived, encodes them in one forward pass and hands each
+    caller its rows; a request that would take a batch past
+    ``max_batch_size`` starts the next one instead. Many threads calling
+    ``add_message`` then share batches instead of each running a batch of
+    one. Requests of ``max_batch_size`` texts or more skip the queue.
+
+    Parameters
+    - embedder: The embedder doing the actual encoding.
+    - max_batch_size: Most texts encoded per batch.
+    - max_wait_ms: Longest a request waits for others to join its batch.
+    """
+
+    def __init__(
+        self,
+        embedder: Embedder,
+        max_batch_size: int = 64,
+        max_wait_ms: float = 5.0,
+    ) -> None:
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        self.embedder = embedder
+        self.model_id = embedder.model_id
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue: "queue.Queue[Optional[_Request]]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker: Optional[threading.Thread] = None
+        self._closed = False
+        # Metrics
+        self._queued_texts = 0
+        self._max_queue_depth = 0
+        self._batches = 0
+        self._batched_texts = 0
+        self._largest_batch = 0
+        self._direct_calls = 0
+
+    @property
+    def dimension(self) -> int:
+        return self.embedder.dimension
+
+    def _ensure_worker(self) -> None:
+        # Started on first use so a preloaded parent process can still fork
+        if self._worker is None:
+            self._worker = threading.Thread(
+                target=self._run, name="cortex-embed-batcher", daemon=True
+            )
+            self._worker.start()
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        if not texts:
+            return np.empty((0, self.dimension), dtype=np.float32)
+        if len(texts) >= self.max_batch_size:
+            with self._lock:
+                if self._closed:
+                    raise RuntimeError("BatchingEmbedder is closed")
+                self._direct_calls += 1
+            return self.embedder.encode(texts)
+
+        request = _Request(list(texts))
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("BatchingEmbedder is closed")
+            self._ensure_worker()
+            self._queued_texts += len(texts)
+            self._max_queue_depth = max(self._max_queue_depth, self._queued_texts)
+            self._queue.put(request)
+        return request.future.result()
+
+    def _run(self) -> None:
+        # Request held back from a full batch, to start the next one
+        held: Optional[_Request] = None
+        while True:
+            first = held if held is not None else self._queue.get()
+            held = None
+            if first is None:
+                return
+            batch = [first]
+            size = len(first.texts)
+            stop = False
+            deadline = time.monotonic() + self.max_wait
+            while size < self.max_batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    request = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if request is None:
+                    stop = True
+                    break
+                if size + len(request.texts) > self.max_batch_size:
+                    held = request
+                    break
+                batch.append(request)
+                size += len(request.texts)
+
+            self._encode_batch(batch, size)
+            if stop:
+                return
+
+    def _encode_batch(self, batch: List[_Request], size: int) -> None:
+        with self._lock:
+            self._queued_texts -= size
+            self._batches += 1
+            self._batched_texts += size
+            self._largest_batch = max(self._largest_batch, size)
+
+        texts = [text for request in batch for text in request.texts]
+        try:
+            embeddings = self.embedder.encode(texts)
+        except Exception as e:
+            for request in batch:
+                request.future.set_exception(e)
+            return
+
+        offset = 0
+        for request in batch:
+            count = len(request.texts)
+            request.future.set_result(embeddings[offset : offset + count])
+            offset += count
+
+    def spec(self) -> Optional[Tuple[str, Dict[str, Any]]]:
+        return self.embedder.spec()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Queue depth (texts waiting) and batch size metrics."""
+        with self._lock:
+            return {
+                "queue_depth": self._queued_texts,
+                "max_queue_depth": self._max_queue_depth,
+                "batches": self._batches,
+                "batched_texts": self._batched_texts,
+                "mean_batch_size": (
+                    self._batched_texts / self._batches if self._batches else 0.0
+                ),
+                "largest_batch": self._largest_batch,
+                "direct_calls": self._direct_calls,
+            }
+
+    def close(self) -> None:
+        """Finish queued requests, stop the worker and close the embedder."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            worker = self._worker
+            if worker is not None:
+                self._queue.put(None)
+        if worker is not None:
+            worker.join()
+        self.embedder.close()
@@ -0,0 +1,72 @@
+"""Length-bucketed batching for bulk encodes.
+
+Transformer encoders pad every input in a batch to the longest one, so a
+batch mixing one-word replies with multi-paragraph messages spends most of
+its compute on padding. ``encode_bucketed`` sorts texts by estimated token
+length, cuts the sorted run into batches whose padded size fits a token
+budget (so short texts get large batches and long texts small ones), encodes
+each batch and scatters the rows back into input order.
+"""
+
+from __future__ import annotations
+
+from typing import List
+
+import numpy as np
+
+from .base import Embedder
+
+# Padded tokens (batch size x longest input) per forward pass
+DEFAULT_TOKEN_BUDGET = 8192
+# Upper bound on texts per batch, however short they are
+DEFAULT_MAX_BATCH_SIZE = 256
+# Typical model input limit; longer texts are truncated by the tokenizer
+MAX_TOKENS = 256
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap word-piece count estimate (about 4/3 tokens per word, plus
+    the [CLS]/[SEP] markers), capped at the model's input limit."""
+    return min(len(text.split()) * 4 // 3 + 2, MAX_TOKENS)
+
+
+def length_batches(
+    texts: List[str],
+    token_budget: int = DEFAULT_TOKEN_BUDGET,
+    max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+) -> List[List[int]]:
+    """Group indices of ``texts`` into length-sorted batches.
+
+    Each batch holds texts of similar length and at most ``max_batch_size``
+    of them, with ``len(batch) * longest`` kept within ``token_budget``
+    tokens.
+    """
+    lengths = [estimate_tokens(text) for text in texts]
+    order = sorted(range(len(texts)), key=lengths.__getitem__)
+
+    batches: List[List[int]] = []
+    batch: List[int] = []
+    for i in order:
+        # Sorted ascending, so the newcomer is the batch's longest text
+        if batch and (
+            len(batch) >= max_batch_size or (len(batch) + 1) * lengths[i] > token_budget
+        ):
+            batches.append(batch)
+            batch = []
+        batch.append(i)
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def encode_bucketed(
+    embedder: Embedder,
+    texts: List[str],
+    token_budget: int = DEFAULT_TOKEN_BUDGET,
+    max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+) -> np.ndarray:
+    """Encode ``texts`` in length-bucketed batches, returned in input order."""
+    embeddings = np.zeros((len(texts), embedder.dimension), dtype=np.float32)
+    for batch in length_batches(texts, token_budget, max_batch_size):
+        embeddings[batch] = embedder.encode([texts[i] for i in batch])
+    return embeddings
@@ -0,0 +1,172 @@
+"""ONNX Runtime embedding backend for CPU inference.
+
+Requires the optional ``onnx`` extra (``pip install cortex-memory[onnx]``).
+Export a sentence-transformers model first, e.g.::
+
+    optimum-cli export onnx --model sentence-transformers/all-MiniLM-L6-v2 models/minilm
+
+which writes ``model.onnx`` and ``tokenizer.json`` into ``models/minilm``.
+With ``quantized=True`` the exported weights are dynamically quantized to int8
+(``model_int8.onnx``, created on first use), which is typically 2-4x faster
+on CPU at a small cost in accuracy.
+"""
+
+from __future__ import annotations
+
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .base import Embedder
+
+try:
+    import onnxruntime
+    from tokenizers import Tokenizer
+except ImportError:  # pragma: no cover - optional dependency
+    onnxruntime = None
+    Tokenizer = None
+
+MODEL_FILE = "model.onnx"
+QUANTIZED_MODEL_FILE = "model_int8.onnx"
+TOKENIZER_FILE = "tokenizer.json"
+
+
+def quantize_model(model_dir: str) -> Path:
+    """Write an int8 dynamically-quantized copy of ``model.onnx``."""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    source = Path(model_dir) / MODEL_FILE
+    target = Path(model_dir) / QUANTIZED_MODEL_FILE
+    quantize_dynamic(str(source), str(target), weight_type=QuantType.QInt8)
+    return target
+
+
+class ONNXEmbedder(Embedder):
+    """Embeds text with an exported transformer run by ONNX Runtime.
+
+    Token embeddings are mean-pooled over the attention mask and, by default,
+    L2-normalized, matching sentence-transformers models such as
+    ``all-MiniLM-L6-v2``.
+
+    Parameters
+    - model_dir: Directory holding ``model.onnx`` and ``tokenizer.json``.
+    - quantized: Run the int8-quantized model (created if missing).
+    - model_id: Embedding cache identity; defaults to ``onnx:<dir name>``
+      (with an ``:int8`` suffix when quantized).
+    - dimension: Output size; read from the model graph when omitted.
+    - max_length: Inputs are truncated to this many tokens.
+    - normalize: L2-normalize the pooled embeddings.
+    - intra_op_threads: ONNX Runtime intra-op thread count (``0`` = default).
+    """
+
+    def __init__(
+        self,
+        model_dir: str,
+        quantized: bool = False,
+        model_id: Optional[str] = None,
+        dimension: Optional[int] = None,
+        max_length: int = 256,
+        normalize: bool = True,
+        intra_op_threads: int = 0,
+    ) -> None:
+        if onnxruntime is None:
+            raise ImportError(
+                "ONNX support requires onnxruntime and tokenizers. "
+                "Install with: pip install cortex-memory[onnx]"
+            )
+
+        self.model_dir = Path(model_dir)
+        self.quantized = quantized
+        suffix = ":int8" if quantized else ""
+        self.model_id = model_id or f"onnx:{self.model_dir.name}{suffix}"
+        self.max_length = max_length
+        self.normalize = normalize
+        self.intra_op_threads = intra_op_threads
+        self._dimension = dimension
+        self._session = None
+        self._tokenizer = None
+        self._lock = threading.Lock()
+
+    def _load(self) -> None:
+        with self._lock:
+            if self._session is not None:
+                return
+            model_file = self.model_dir / MODEL_FILE
+            if self.quantized:
+                model_file = self.model_dir / QUANTIZED_MODEL_FILE
+                if not model_file.exists():
+                    quantize_model(str(self.model_dir))
+
+            options = onnxruntime.SessionOptions()
+            options.intra_op_num_threads = self.intra_op_threads
+            tokenizer = Tokenizer.from_file(str(self.model_dir / TOKENIZER_FILE))
+            tokenizer.enable_truncation(max_length=self.max_length)
+            tokenizer.enable_padding()
+
+            self._tokenizer = tokenizer
+            self._session = onnxruntime.InferenceSession(
+                str(model_file), options, providers=["CPUExecutionProvider"]
+            )
+
+    @property
+    def dimension(self) -> int:
+        if self._dimension is None:
+            self._load()
+            size = self._session.get_outputs()[0].shape[-1]
+            if not isinstance(size, int):
+                raise ValueError(
+                    f"Cannot infer the embedding dimension of {self.model_dir}; "
+                    "pass dimension="
+                )
+            self._dimension = size
+        return self._dimension
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        self._load()
+        if not texts:
+            return np.empty((0, self.dimension), dtype=np.float32)
+
+        encodings = self._tokenizer.encode_batch(texts)
+        mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        feeds: Dict[str, np.ndarray] = {}
+        for model_input in self._session.get_inputs():
+            if model_input.name == "input_ids":
+                feeds["input_ids"] = np.array(
+                    [e.ids for e in encodings], dtype=np.int64
+                )
+            elif model_input.name == "attention_mask":
+                feeds["attention_mask"] = mask
+            elif model_input.name == "token_type_ids":
+                feeds["token_type_ids"] = np.array(
+                    [e.type_ids for e in encodings], dtype=np.int64
+                )
+
+        output = self._session.run(None, feeds)[0].astype(np.float32)
+        if output.ndim == 3:
+            # Mean-pool token embeddings, ignoring padding
+            weights = mask[:, :, None].astype(np.float32)
+            output = (output * weights).sum(axis=1) / np.maximum(
+                weights.sum(axis=1), 1e-9
+            )
+        if self.normalize:
+            norms = np.linalg.norm(output, axis=1, keepdims=True)
+            output = output / np.maximum(norms, 1e-12)
+        return np.ascontiguousarray(output, dtype=np.float32)
+
+    def spec(self) -> Optional[Tuple[str, Dict[str, Any]]]:
+        return "onnx", {
+            "model_dir": str(self.model_dir),
+            "quantized": self.quantized,
+            "model_id": self.model_id,
+            "dimension": self._dimension,
+            "max_length": self.max_length,
+            "normalize": self.normalize,
+            "intra_op_threads": self.intra_op_threads,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._session = None
+            self._tokenizer = None
@@ -0,0 +1,133 @@
+"""Multi-process embedding pool for bulk imports.
+
+Each worker process builds its own copy of the embedder (from the
+``create_embedder`` backend name and keyword arguments) and encodes
+length-bucketed batches in parallel. Embeddings are written straight into a
+shared-memory buffer owned by the parent, so only texts and row indices
+cross the process boundary; the vectors are never pickled back.
+"""
+
+from __future__ import annotations
+
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .base import Embedder
+from .bucketing import DEFAULT_TOKEN_BUDGET, length_batches
+
+# The embedder of the current worker process
+_worker_embedder: Optional[Embedder] = None
+
+
+def _init_worker(backend: str, kwargs: Dict[str, Any], threads: int) -> None:
+    global _worker_embedder
+    # Keep workers from oversubscribing the CPU with intra-op threads
+    os.environ["OMP_NUM_THREADS"] = str(threads)
+    os.environ["MKL_NUM_THREADS"] = str(threads)
+
+    from . import create_embedder
+
+    _worker_embedder = create_embedder(backend, **kwargs)
+
+
+def _encode_into(shm_name: str, shape: tuple, rows: List[int], texts: List[str]) -> int:
+    embeddings = _worker_embedder.encode(texts)
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        out = np.ndarray(shape, dtype=np.float32, buffer=shm.buf)
+        out[rows] = embeddings
+        del out
+    finally:
+        shm.close()
+    return len(rows)
+
+
+class ProcessPoolEmbedder(Embedder):
+    """Encodes large inputs across a pool of worker processes.
+
+    Parameters
+    - embedder: The embedder to replicate; each worker rebuilds it from
+      ``embedder.spec()`` (the parent's copy need not be loaded).
+    - workers: Number of worker processes.
+    - token_budget: Padded tokens per batch sent to a worker.
+    - start_method: ``multiprocessing`` start method (``"spawn"`` is safe
+      with threads and CUDA).
+
+    Workers are started on the first ``encode`` and live until ``close``.
+    """
+
+    def __init__(
+        self,
+        embedder: Embedder,
+        workers: int = 2,
+        token_budget: int = DEFAULT_TOKEN_BUDGET,
+        start_method: str = "spawn",
+    ) -> None:
+        if workers < 1:
+            raise ValueError("workers must be at least 1")
+        spec = embedder.spec()
+        if spec is None:
+            raise ValueError(
+                f"{type(embedder).__name__} cannot be rebuilt in worker processes"
+            )
+
+        self.backend, self.embedder_kwargs = spec
+        self.workers = workers
+        self.model_id = embedder.model_id
+        self._dimension = embedder.dimension
+        self.token_budget = token_budget
+        self.start_method = start_method
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    @property
+    def dimension(self) -> int:
+        return self._dimension
+
+    def _pool(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            threads = max(1, (os.cpu_count() or 1) // self.workers)
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context(self.start_method),
+                initializer=_init_worker,
+                initargs=(self.backend, self.embedder_kwargs, threads),
+            )
+        return self._executor
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        shape = (len(texts), self.dimension)
+        if not texts:
+            return np.empty(shape, dtype=np.float32)
+
+        shm = shared_memory.SharedMemory(create=True, size=len(texts) * shape[1] * 4)
+        try:
+            pool = self._pool()
+            futures = [
+                pool.submit(
+                    _encode_into, shm.name, shape, batch, [texts[i] for i in batch]
+                )
+                for batch in length_batches(texts, self.token_budget)
+            ]
+            for future in futures:
+                future.result()
+            out = np.ndarray(shape, dtype=np.float32, buffer=shm.buf)
+            embeddings = out.copy()
+            del out
+        finally:
+            shm.close()
+            shm.unlink()
+        return embeddings
+
+    def spec(self) -> Optional[Tuple[str, Dict[str, Any]]]:
+        return self.backend, self.embedder_kwargs
+
+    def close(self) -> None:
+        """Shut the worker processes down."""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
@@ -0,0 +1,96 @@
+"""sentence-transformers embedding backend (the default)."""
+
+from __future__ import annotations
+
+import threading
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from ..model_registry import DEFAULT_MODEL, ModelRegistry, default_registry
+from .base import Embedder
+
+if TYPE_CHECKING:
+    from sentence_transformers import SentenceTransformer
+
+# Output sizes of common models, so opening a memory needn't load the model
+KNOWN_DIMENSIONS = {
+    "all-MiniLM-L6-v2": 384,
+    "all-MiniLM-L12-v2": 384,
+    "multi-qa-MiniLM-L6-cos-v1": 384,
+    "paraphrase-MiniLM-L6-v2": 384,
+    "all-mpnet-base-v2": 768,
+    "multi-qa-mpnet-base-dot-v1": 768,
+}
+
+
+class SentenceTransformerEmbedder(Embedder):
+    """Embeds text with a sentence-transformers model.
+
+    Parameters
+    - model_name: sentence-transformers model name or path.
+    - device: Torch device (``None`` lets sentence-transformers pick one).
+    - dimension: Output size; looked up in ``KNOWN_DIMENSIONS`` or read from
+      the model (which loads it) when omitted.
+    - registry: Model registry to share the loaded model through (defaults
+      to the process-wide one).
+    - batch_size: Most texts per forward pass. Callers that size their own
+      batches (``encode_bucketed``) get one pass per ``encode`` call up to
+      this size.
+
+    The model is imported and loaded on the first ``encode``.
+    """
+
+    def __init__(
+        self,
+        model_name: str = DEFAULT_MODEL,
+        device: Optional[str] = None,
+        dimension: Optional[int] = None,
+        registry: Optional[ModelRegistry] = None,
+        batch_size: int = 256,
+    ) -> None:
+        self.model_name = model_name
+        self.model_id = model_name
+        self.device = device
+        self.registry = registry or default_registry
+        self.batch_size = batch_size
+        self._dimension = dimension or KNOWN_DIMENSIONS.get(model_name)
+        self._model: Optional[SentenceTransformer] = None
+        self._lock = threading.Lock()
+
+    @property
+    def model(self) -> SentenceTransformer:
+        """The shared model, acquired from the registry on first access."""
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    self._model = self.registry.acquire(self.model_name, self.device)
+        return self._model
+
+    @property
+    def dimension(self) -> int:
+        if self._dimension is None:
+            self._dimension = self.model.get_sentence_embedding_dimension()
+        return self._dimension
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        embeddings = self.model.encode(
+            texts,
+            batch_size=max(1, min(len(texts), self.batch_size)),
+            convert_to_tensor=False,
+        )
+        return np.asarray(embeddings, dtype=np.float32).reshape(len(texts), -1)
+
+    def spec(self) -> Optional[Tuple[str, Dict[str, Any]]]:
+        return "sentence-transformers", {
+            "model_name": self.model_name,
+            "device": self.device,
+            "dimension": self._dimension,
+            "batch_size": self.batch_size,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            if self._model is not None:
+                self._model = None
+                self.registry.release(self.model_name, self.device)
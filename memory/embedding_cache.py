@@ -0,0 +1,115 @@
+"""Content-addressed cache of text embeddings.
+
+Embeddings are keyed by the SHA-256 of the text plus the id of the model that
+produced them. Stored message embeddings (``message_embeddings``, which
+records both keys) are the persistent level, fronted by an in-process LRU
+that also holds recently encoded text that was never stored, such as
+queries. Repeated strings (greetings, canned replies, retried turns) are then
+encoded once per model instead of on every ingest or query, without keeping
+a second copy of each embedding on disk.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from .store import SQLiteStore
+
+
+def content_hash(text: str) -> str:
+    """Hex SHA-256 of ``text`` encoded as UTF-8."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """Two-level (LRU over stored message embeddings) cache for one model.
+
+    Lookups only read SQLite; ``put_many`` fills the LRU alone, since the
+    embeddings worth keeping are persisted with their messages.
+
+    Parameters
+    - store: SQLite store holding the ``message_embeddings`` table.
+    - model_id: Identifier of the embedding model; embeddings of other models
+      sharing the table are never returned.
+    - max_entries: Size of the in-process LRU (``0`` disables it).
+    """
+
+    def __init__(
+        self,
+        store: SQLiteStore,
+        model_id: str,
+        max_entries: int = 10_000,
+    ) -> None:
+        self.store = store
+        self.model_id = model_id
+        self.max_entries = max_entries
+        self._lru: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _remember(self, key: str, embedding: np.ndarray) -> None:
+        if not self.max_entries:
+            return
+        with self._lock:
+            self._lru[key] = embedding
+            self._lru.move_to_end(key)
+            while len(self._lru) > self.max_entries:
+                self._lru.popitem(last=False)
+
+    def get_many(self, texts: Sequence[str]) -> List[Optional[np.ndarray]]:
+        """Cached embeddings for ``texts`` (``None`` where not cached)."""
+        keys = [content_hash(text) for text in texts]
+        found: Dict[str, np.ndarray] = {}
+        with self._lock:
+            for key in keys:
+                embedding = self._lru.get(key)
+                if embedding is not None:
+                    self._lru.move_to_end(key)
+                    found[key] = embedding
+
+        rows = self.store.query_in(
+            """
+            SELECT content_hash, embedding FROM message_embeddings
+            WHERE content_hash IN ({placeholders}) AND model_id = ?
+            """,
+            [key for key in keys if key not in found],
+            [self.model_id],
+        )
+        for row in rows:
+            embedding = np.frombuffer(row["embedding"], dtype=np.float32)
+            found[row["content_hash"]] = embedding
+            self._remember(row["content_hash"], embedding)
+
+        results = [found.get(key) for key in keys]
+        hits = sum(embedding is not None for embedding in results)
+        with self._lock:
+            self.hits += hits
+            self.misses += len(results) - hits
+        return results
+
+    def put_many(self, texts: Sequence[str], embeddings: np.ndarray) -> None:
+        """Cache one embedding per text in the LRU; nothing is written to
+        SQLite."""
+        for text, embedding in zip(texts, embeddings):
+            embedding = np.array(embedding, dtype=np.float32).reshape(-1)
+            self._remember(content_hash(text), embedding)
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "lru_entries": len(self._lru),
+                "lru_capacity": self.max_entries,
+            }
+
+    def clear(self) -> None:
+        """Empty the LRU; stored message embeddings are left alone."""
+        with self._lock:
+            self._lru.clear()
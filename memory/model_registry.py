@@ -0,0 +1,104 @@
+"""Process-wide registry of shared embedding models.
+
+Sentence-transformer models are large, so every ``ConversationMemory`` in a
+process that uses the same model name and device shares one instance. Models
+are reference counted and unloaded once the last user releases them, unless
+they were preloaded (e.g. in a parent process before forking workers, so the
+children share the weights copy-on-write).
+"""
+
+from __future__ import annotations
+
+import threading
+from typing import TYPE_CHECKING, Dict, Optional, Set, Tuple
+
+if TYPE_CHECKING:
+    from sentence_transformers import SentenceTransformer
+
+ModelKey = Tuple[str, Optional[str]]
+
+DEFAULT_MODEL = "all-MiniLM-L6-v2"
+
+
+class ModelRegistry:
+    """Thread-safe, reference-counted cache of loaded models.
+
+    Models are keyed by ``(model_name, device)``; ``device=None`` lets
+    sentence-transformers pick one.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._models: Dict[ModelKey, SentenceTransformer] = {}
+        self._refcounts: Dict[ModelKey, int] = {}
+        self._pinned: Set[ModelKey] = set()
+
+    def _load(self, key: ModelKey) -> SentenceTransformer:
+        model = self._models.get(key)
+        if model is None:
+            from sentence_transformers import SentenceTransformer
+
+            name, device = key
+            model = SentenceTransformer(name, device=device)
+            self._models[key] = model
+            self._refcounts[key] = 0
+        return model
+
+    def acquire(self, name: str, device: Optional[str] = None) -> SentenceTransformer:
+        """Return the shared model, loading it on first use.
+
+        Every ``acquire`` must be paired with a ``release``.
+        """
+        key = (name, device)
+        with self._lock:
+            model = self._load(key)
+            self._refcounts[key] += 1
+            return model
+
+    def release(self, name: str, device: Optional[str] = None) -> None:
+        """Drop one reference; the last one unloads an unpinned model."""
+        key = (name, device)
+        with self._lock:
+            if self._refcounts.get(key, 0) <= 0:
+                return
+            self._refcounts[key] -= 1
+            if self._refcounts[key] == 0 and key not in self._pinned:
+                del self._models[key]
+                del self._refcounts[key]
+
+    def preload(self, name: str, device: Optional[str] = None) -> SentenceTransformer:
+        """Load a model and keep it resident regardless of references."""
+        key = (name, device)
+        with self._lock:
+            model = self._load(key)
+            self._pinned.add(key)
+            return model
+
+    def unload(self, name: str, device: Optional[str] = None) -> None:
+        """Unpin a preloaded model; it is dropped once unreferenced."""
+        key = (name, device)
+        with self._lock:
+            self._pinned.discard(key)
+            if key in self._models and self._refcounts[key] == 0:
+                del self._models[key]
+                del self._refcounts[key]
+
+    def loaded(self) -> Dict[ModelKey, int]:
+        """Currently loaded models and their reference counts."""
+        with self._lock:
+            return dict(self._refcounts)
+
+
+# Registry shared by every ConversationMemory in the process
+default_registry = ModelRegistry()
+
+
+def preload_model(
+    name: str = DEFAULT_MODEL, device: Optional[str] = None
+) -> SentenceTransformer:
+    """Load a model into the process-wide registry ahead of first use.
+
+    Call this before forking worker processes so they inherit the loaded
+    weights instead of each loading their own copy.
+    """
+    return default_registry.preload(name, device)
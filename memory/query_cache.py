@@ -0,0 +1,114 @@
+"""In-process cache of query embeddings.
+
+Chat loops embed the same query strings over and over (context lookups,
+repeated searches, retries). ``QueryEmbeddingCache`` keeps recent query
+vectors in a bounded LRU, limited by entry count and by memory, with an
+optional time-to-live so long-running processes don't serve stale entries
+forever.
+"""
+
+from __future__ import annotations
+
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+
+def normalize_query(query: str) -> str:
+    """Cache key for a query: surrounding and repeated whitespace removed."""
+    return " ".join(query.split())
+
+
+class QueryEmbeddingCache:
+    """Thread-safe LRU of query embeddings.
+
+    Parameters
+    - max_entries: Most queries kept (``0`` disables the cache).
+    - max_bytes: Memory budget for keys plus vectors.
+    - ttl_seconds: Entries older than this are treated as misses
+      (``None`` keeps them until evicted).
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        max_bytes: int = 16 * 1024 * 1024,
+        ttl_seconds: Optional[float] = 300.0,
+    ) -> None:
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        # key -> (embedding, inserted at, size in bytes)
+        self._entries: "OrderedDict[str, Tuple[np.ndarray, float, int]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+
+    def get(self, query: str) -> Optional[np.ndarray]:
+        """Cached embedding of ``query``, or ``None``."""
+        key = normalize_query(query)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl_seconds is not None:
+                if time.monotonic() - entry[1] > self.ttl_seconds:
+                    self._drop(key)
+                    self.expired += 1
+                    entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, query: str, embedding: np.ndarray) -> None:
+        """Cache ``embedding`` for ``query``, evicting the least recent."""
+        if not self.max_entries:
+            return
+        key = normalize_query(query)
+        embedding = np.array(embedding, dtype=np.float32)
+        embedding.setflags(write=False)
+        size = sys.getsizeof(key) + embedding.nbytes
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (embedding, time.monotonic(), size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _drop(self, key: str) -> None:
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "expired": self.expired,
+                "evictions": self.evictions,
+            }
@@ -2,25 +2,60 @@
 
 This module avoids external dependencies and provides a thin wrapper
 around SQLite with sane defaults (WAL, foreign keys, row factory, thread safety).
+
+Each ``execute`` commits on its own. ``with store.transaction():`` groups
+statements into one atomic commit, and ``UnitOfWork`` collects statements to
+run later as one transaction.
+
+With ``group_commit_ms`` set, units of work are handed to a background
+writer thread instead, which commits every unit that arrives within that
+window (or until ``group_commit_rows`` rows) in one transaction. Each caller
+still returns only after its own rows are committed.
+
+By default one connection serves reads and writes under a lock. With
+``readers=N`` reads go to a pool of N read-only connections instead; in WAL
+mode they run in parallel with each other and with the writer, each seeing
+the last committed state.
 """
 
 from __future__ import annotations
 
+import queue
 import sqlite3
 import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Iterable, Optional, Sequence
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple
 from types import TracebackType
 
+# Values bound per ``IN (...)`` list by ``query_in``, below SQLite's default
+# variable limit (999)
+IN_CHUNK_SIZE = 500
+
 
 class SQLiteStore:
     """Thread-safe convenience wrapper around ``sqlite3.Connection``.
 
     Parameters
     - db_path: Path to the SQLite database file. Use ``":memory:"`` for in-memory.
+    - readers: Number of pooled read-only connections for ``query_all`` /
+      ``query_one`` (``0`` reads through the writer connection). Ignored for
+      in-memory databases, which cannot be shared between connections.
+    - group_commit_ms: Enable the group-commit writer: units of work are
+      committed together in batches collected for up to this many
+      milliseconds (``None`` commits each unit immediately).
+    - group_commit_rows: Commit a batch early once it holds this many rows.
     """
 
-    def __init__(self, db_path: str = ":memory:") -> None:
+    def __init__(
+        self,
+        db_path: str = ":memory:",
+        readers: int = 0,
+        group_commit_ms: Optional[float] = None,
+        group_commit_rows: int = 1000,
+    ) -> None:
         self._db_path = db_path
         if db_path != ":memory:":
             Path(db_path).parent.mkdir(parents=True, exist_ok=True)
@@ -29,8 +64,35 @@ class SQLiteStore:
         self._conn = sqlite3.connect(db_path, check_same_thread=False)
         self._conn.row_factory = sqlite3.Row
         self._lock = threading.RLock()
+        # Open transaction nesting depth and the thread that owns it
+        self._tx_depth = 0
+        self._tx_owner: Optional[int] = None
         self._configure()
 
+        # Each reader is used by one thread at a time, checked out of the queue
+        self._readers: List[sqlite3.Connection] = []
+        self._idle_readers: "queue.Queue[sqlite3.Connection]" = queue.Queue()
+        if db_path != ":memory:":
+            for _ in range(readers):
+                reader = sqlite3.connect(db_path, check_same_thread=False)
+                reader.row_factory = sqlite3.Row
+                reader.execute("PRAGMA query_only=ON;")
+                self._readers.append(reader)
+                self._idle_readers.put(reader)
+
+        # Group commit: units of work queued for the background writer
+        self._group_wait = None if group_commit_ms is None else group_commit_ms / 1000
+        self._group_rows = group_commit_rows
+        self._pending: "queue.Queue[Optional[Tuple[UnitOfWork, Future]]]" = (
+            queue.Queue()
+        )
+        self._writer: Optional[threading.Thread] = None
+        if self._group_wait is not None:
+            self._writer = threading.Thread(
+                target=self._run_writer, name="cortex-group-commit", daemon=True
+            )
+            self._writer.start()
+
     def _configure(self) -> None:
         with self._conn:
             self._conn.execute("PRAGMA journal_mode=WAL;")
@@ -41,7 +103,8 @@ class SQLiteStore:
     def execute(self, sql: str, params: Sequence | None = None) -> sqlite3.Cursor:
         with self._lock:
             cur = self._conn.execute(sql, params or [])
-            self._conn.commit()
+            if not self._tx_depth:
+                self._conn.commit()
             return cur
 
     def executemany(
@@ -49,25 +112,173 @@ class SQLiteStore:
     ) -> sqlite3.Cursor:
         with self._lock:
             cur = self._conn.executemany(sql, seq_of_params)
-            self._conn.commit()
+            if not self._tx_depth:
+                self._conn.commit()
             return cur
 
-    def query_all(self, sql: str, params: Sequence | None = None) -> list[sqlite3.Row]:
+    @contextmanager
+    def transaction(self) -> Iterator["SQLiteStore"]:
+        """Run the enclosed writes as one atomic transaction.
+
+        Commits once on exit, or rolls back if the block raises. Other
+        threads' writes wait until it ends. Nested blocks join the outermost
+        transaction, and reads from the owning thread see its uncommitted
+        writes.
+        """
         with self._lock:
-            cur = self._conn.execute(sql, params or [])
+            if self._tx_depth:
+                self._tx_depth += 1
+                try:
+                    yield self
+                finally:
+                    self._tx_depth -= 1
+                return
+
+            self._conn.execute("BEGIN IMMEDIATE")
+            self._tx_depth = 1
+            self._tx_owner = threading.get_ident()
+            try:
+                yield self
+            except BaseException:
+                self._conn.rollback()
+                raise
+            else:
+                self._conn.commit()
+            finally:
+                self._tx_depth = 0
+                self._tx_owner = None
+
+    @contextmanager
+    def _reader(self) -> Iterator[sqlite3.Connection]:
+        """A connection to read from: a pooled reader, or the writer."""
+        if not self._readers or self._tx_owner == threading.get_ident():
+            with self._lock:
+                yield self._conn
+            return
+
+        reader = self._idle_readers.get()
+        try:
+            yield reader
+        finally:
+            self._idle_readers.put(reader)
+
+    def query_all(self, sql: str, params: Sequence | None = None) -> list[sqlite3.Row]:
+        with self._reader() as conn:
+            cur = conn.execute(sql, params or [])
             return cur.fetchall()
 
+    def query_in(
+        self, sql: str, values: Iterable, params: Sequence = ()
+    ) -> list[sqlite3.Row]:
+        """Rows of ``sql`` for every one of ``values``, however many.
+
+        ``sql`` marks its ``IN`` list with ``{placeholders}``; it is run once
+        per ``IN_CHUNK_SIZE`` distinct values, each chunk bound ahead of
+        ``params``.
+        """
+        values = list(dict.fromkeys(values))
+        rows: list[sqlite3.Row] = []
+        for start in range(0, len(values), IN_CHUNK_SIZE):
+            chunk = values[start : start + IN_CHUNK_SIZE]
+            rows.extend(
+                self.query_all(
+                    sql.format(placeholders=", ".join("?" * len(chunk))),
+                    [*chunk, *params],
+                )
+            )
+        return rows
+
     def query_one(
         self, sql: str, params: Sequence | None = None
     ) -> Optional[sqlite3.Row]:
-        with self._lock:
-            cur = self._conn.execute(sql, params or [])
-            return cur.fetchone()
+        with self._reader() as conn:
+            cur = conn.execute(sql, params or [])
+            row = cur.fetchone()
+            cur.close()
+            return row
+
+    def commit_unit(self, uow: "UnitOfWork") -> None:
+        """Commit a unit of work, through the group-commit writer if enabled.
+
+        Blocks until the unit is committed and re-raises its error if it
+        failed; a failed unit never affects the others in its group.
+        """
+        if self._writer is None or self._tx_owner == threading.get_ident():
+            # Direct, or joining the transaction this thread already holds
+            with self.transaction():
+                uow.apply()
+            return
+
+        future: Future = Future()
+        self._pending.put((uow, future))
+        future.result()
+
+    def _run_writer(self) -> None:
+        while True:
+            first = self._pending.get()
+            if first is None:
+                return
+            group = [first]
+            rows = first[0].rows
+            stop = False
+            deadline = time.monotonic() + self._group_wait
+            while rows < self._group_rows:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self._pending.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                group.append(item)
+                rows += item[0].rows
+
+            self._commit_group(group)
+            if stop:
+                return
+
+    def _commit_group(self, group: List[Tuple["UnitOfWork", Future]]) -> None:
+        """Apply each unit under its own savepoint, then commit them all."""
+        failed = {}
+        try:
+            with self.transaction():
+                for i, (uow, _) in enumerate(group):
+                    self._conn.execute("SAVEPOINT unit")
+                    try:
+                        uow.apply()
+                    except Exception as e:
+                        self._conn.execute("ROLLBACK TO unit")
+                        failed[i] = e
+                    self._conn.execute("RELEASE unit")
+        except Exception as e:
+            for _, future in group:
+                future.set_exception(e)
+            return
+
+        for i, (_, future) in enumerate(group):
+            if i in failed:
+                future.set_exception(failed[i])
+            else:
+                future.set_result(None)
 
     def close(self) -> None:
+        if self._writer is not None:
+            self._pending.put(None)
+            self._writer.join()
+            self._writer = None
         with self._lock:
+            for _ in self._readers:
+                self._idle_readers.get().close()
+            self._readers = []
             self._conn.close()
 
+    def unit_of_work(self) -> "UnitOfWork":
+        """Start collecting statements to commit together later."""
+        return UnitOfWork(self)
+
     # Context manager support
     def __enter__(self) -> "SQLiteStore":
         return self
@@ -79,3 +290,63 @@ class SQLiteStore:
         tb: TracebackType | None,
     ) -> None:
         self.close()
+
+
+class UnitOfWork:
+    """Statements collected now and applied later in one transaction.
+
+    Build the batch with ``execute`` / ``executemany`` (nothing touches the
+    database yet), then ``commit()`` runs it all under a single commit. Used
+    as a context manager it commits on a clean exit and discards the batch
+    if the block raises.
+    """
+
+    def __init__(self, store: SQLiteStore) -> None:
+        self.store = store
+        # (sql, params, many)
+        self.statements: List[Tuple[str, Sequence, bool]] = []
+        # Rows written, for sizing group commits
+        self.rows = 0
+
+    def execute(self, sql: str, params: Sequence | None = None) -> "UnitOfWork":
+        self.statements.append((sql, params or [], False))
+        self.rows += 1
+        return self
+
+    def executemany(self, sql: str, seq_of_params: Iterable[Sequence]) -> "UnitOfWork":
+        params = list(seq_of_params)
+        self.statements.append((sql, params, True))
+        self.rows += len(params)
+        return self
+
+    def apply(self) -> None:
+        """Run the statements on the store's connection (caller commits)."""
+        for sql, params, many in self.statements:
+            if many:
+                self.store.executemany(sql, params)
+            else:
+                self.store.execute(sql, params)
+
+    def commit(self) -> None:
+        """Apply every collected statement in one transaction (shared with
+        other units when the store uses group commit)."""
+        if not self.statements:
+            return
+        self.store.commit_unit(self)
+        self.statements = []
+        self.rows = 0
+
+    def __enter__(self) -> "UnitOfWork":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        tb: TracebackType | None,
+    ) -> None:
+        if exc_type is None:
+            self.commit()
+        else:
+            self.statements = []
+            self.rows = 0
@@ -0,0 +1,33 @@
+"""Pluggable vector store backends for Cortex."""
+
+from __future__ import annotations
+
+from .base import BaseVectorStore, SearchFilter, timestamp_to_epoch
+
+
+def create_vector_store(backend: str = "faiss", **kwargs) -> BaseVectorStore:
+    """Instantiate a vector store backend by name.
+
+    - ``"faiss"``: local FAISS indexes (see ``FAISSVectorStore``)
+    - ``"pinecone"``: Pinecone cloud index (requires the ``pinecone`` extra)
+
+    Keyword arguments are forwarded to the backend constructor, e.g.
+    ``create_vector_store("faiss", vector_dir="vectors", partitioned=True)``.
+    """
+    if backend == "faiss":
+        from .local_faiss import FAISSVectorStore
+
+        return FAISSVectorStore(**kwargs)
+    if backend == "pinecone":
+        from .pinecone_store import PineconeVectorStore
+
+        return PineconeVectorStore(**kwargs)
+    raise ValueError(f"Unknown vector backend: {backend!r}")
+
+
+__all__ = [
+    "BaseVectorStore",
+    "SearchFilter",
+    "create_vector_store",
+    "timestamp_to_epoch",
+]
@@ -0,0 +1,135 @@
+"""Abstract interface shared by all vector store backends."""
+
+from __future__ import annotations
+
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, FrozenSet, List, Optional, Tuple
+
+import numpy as np
+
+
+def timestamp_to_epoch(timestamp: str) -> float:
+    """Convert an ISO-8601 timestamp to epoch seconds (naive means UTC)."""
+    parsed = datetime.fromisoformat(timestamp.replace("Z", "+00:00"))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+@dataclass(frozen=True)
+class SearchFilter:
+    """Restricts a similarity search to matching messages.
+
+    - role: only messages with this role
+    - conversation_ids: only messages from these conversations
+    - exclude_conversation_ids: skip messages from these conversations
+    - since / until: ISO-8601 timestamp range (``since`` inclusive,
+      ``until`` exclusive)
+    - message_ids: only these message ids (how ``ConversationMemory`` hands
+      the other conditions, resolved in SQL, to backends that cannot
+      evaluate them natively)
+    - exclude_message_ids: skip these message ids (the resolved form of a
+      filter that only excludes conversations)
+    """
+
+    role: Optional[str] = None
+    conversation_ids: Optional[FrozenSet[str]] = None
+    exclude_conversation_ids: Optional[FrozenSet[str]] = None
+    since: Optional[str] = None
+    until: Optional[str] = None
+    message_ids: Optional[FrozenSet[str]] = None
+    exclude_message_ids: Optional[FrozenSet[str]] = None
+
+
+class BaseVectorStore(ABC):
+    """Stores embeddings keyed by message id and answers similarity queries.
+
+    Every method accepts an optional ``namespace`` (the owning user id when
+    called from ``ConversationMemory``). Stores created with
+    ``partitioned=True`` keep one partition per namespace, so a search only
+    scans that namespace's vectors. Unpartitioned stores ignore it.
+
+    ``dimension`` is the length of the stored vectors; ``ConversationMemory``
+    refuses to open a store whose dimension differs from its embedder's.
+    Stores opened ``read_only`` reject writes, so pending writes are not
+    replayed into them.
+
+    Searches take an optional ``SearchFilter`` that is applied inside the
+    index, so every returned hit matches it. Backends that keep message
+    metadata set ``supports_metadata_filter`` and evaluate the structured
+    fields themselves; the others only honour ``SearchFilter.message_ids``
+    and ``SearchFilter.exclude_message_ids``.
+
+    ``vector_source``, when set, returns the exact vectors of the given
+    message ids (those it knows). Backends with lossy indexes rebuild from it
+    instead of from their own decoded vectors.
+    """
+
+    dimension: int
+    read_only: bool = False
+    vector_source: Optional[Callable[[List[str]], Dict[str, np.ndarray]]] = None
+    partitioned: bool = False
+    supports_metadata_filter: bool = False
+
+    @abstractmethod
+    def add_vectors(
+        self,
+        vectors: np.ndarray,
+        ids: List[str],
+        namespace: Optional[str] = None,
+        metadata: Optional[List[Dict[str, Any]]] = None,
+    ) -> None:
+        """Add ``vectors`` (shape ``(n, dim)``) under the given message ids."""
+
+    @abstractmethod
+    def search_similar(
+        self,
+        query_vector: np.ndarray,
+        k: int = 10,
+        namespace: Optional[str] = None,
+        filter: Optional[SearchFilter] = None,
+    ) -> List[Tuple[str, float]]:
+        """Return up to ``k`` ``(message_id, score)`` pairs, best first."""
+
+    @abstractmethod
+    def delete_vector(self, vector_id: str, namespace: Optional[str] = None) -> bool:
+        """Delete a single vector. Returns ``True`` if it was present."""
+
+    def delete_vectors(self, ids: List[str], namespace: Optional[str] = None) -> int:
+        """Delete several vectors at once. Returns how many were present.
+
+        Backends override this with a bulk operation where they have one.
+        """
+        return sum(self.delete_vector(vector_id, namespace) for vector_id in ids)
+
+    def delete_namespace(self, namespace: str) -> int:
+        """Drop every vector stored under ``namespace``.
+
+        Only meaningful for partitioned stores; returns the number of vectors
+        removed when the backend can report it.
+        """
+        raise NotImplementedError(
+            f"{type(self).__name__} does not support deleting a namespace"
+        )
+
+    def clear(self) -> None:
+        """Remove every vector from the store (all namespaces)."""
+        raise NotImplementedError(f"{type(self).__name__} does not support clear()")
+
+    def compact(self) -> None:
+        """Consolidate on-disk state; a no-op for managed backends."""
+
+    def sync(self) -> None:
+        """Make every write accepted so far durable.
+
+        A no-op for backends whose writes are durable once they return.
+        """
+
+    @abstractmethod
+    def get_stats(self) -> Dict[str, Any]:
+        """Return backend-specific statistics (always includes ``backend``)."""
+
+    def close(self) -> None:
+        """Flush pending state and release resources."""
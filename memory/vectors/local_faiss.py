@@ -0,0 +1,1220 @@
+"""Local FAISS vector store backend.
+
+Vectors are kept in FAISS indexes persisted under ``vector_dir``. In the
+default mode there is one global index (``faiss_index.bin`` plus
+``message_ids.pkl``). With ``partitioned=True`` every namespace gets its own
+index under ``vector_dir/partitions/<hash>/`` so a search for one user never
+has to scan, or compete with, another user's vectors.
+
+``index_type`` selects the index structure: exact ``"flat"`` search (default),
+the approximate ``"ivf_flat"``, ``"ivf_pq"`` and ``"hnsw"`` indexes, or
+``"auto"``, which starts flat and moves to IVF indexes as a partition grows.
+IVF indexes need training data, so a partition stays flat until it holds
+enough vectors and is then retrained (in a background thread by default).
+
+On disk each partition is a base snapshot plus an append-only delta log::
+
+    CURRENT                  generation of the live base snapshot
+    base-<gen>.index/.ids    FAISS index and positional message ids
+    delta-<n>.log            add/delete records written after that snapshot
+
+Writes only append a small record to the active delta log. Once the logs hold
+``merge_threshold`` records a background merge writes a new base snapshot,
+atomically bumps ``CURRENT`` and deletes the merged logs. The merge writes the
+frozen index without holding the store lock; vectors added meanwhile go to a
+small side index that is folded back in afterwards. Failed background merges
+and rebuilds are logged and counted in ``get_stats()``. Startup loads the base
+and replays the remaining logs, starting over if a merge bumps ``CURRENT``
+meanwhile; missing or unreadable files are otherwise an error. Directories
+written by 0.1.0 (``faiss_index.bin`` + ``message_ids.pkl``) are read as
+generation 0. ``store.json`` at the top of ``vector_dir`` records the
+dimension and metric the directory was created with; opening it with
+different ones fails.
+
+Deletes never rebuild an index in place. A deleted vector's position is
+tombstoned (its id becomes ``None`` in the id list, persisted with the
+snapshot) and excluded inside FAISS searches through an ``IDSelectorBitmap``.
+Once a partition's tombstoned share reaches ``compact_ratio`` it is rebuilt
+without them in the background. ``ivf_pq`` codes are lossy, so those
+partitions are only compacted or re-trained from exact vectors supplied by
+``vector_source`` (``ConversationMemory`` reads them from SQLite), never by
+re-encoding their own decoded vectors.
+
+With ``mmap=True`` the store is opened read-only: base snapshots are
+memory-mapped instead of read into RAM, so opening is near-instant and every
+process serving the same directory shares one copy in the OS page cache.
+Vectors from the delta logs go into a small in-memory index searched alongside
+the mapped base. Call ``refresh()`` to pick up snapshots written since.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import math
+import os
+import pickle
+import shutil
+import struct
+import threading
+from pathlib import Path
+from typing import Any, Dict, FrozenSet, List, Optional, Set, Tuple
+
+import faiss
+import numpy as np
+
+from .base import BaseVectorStore, SearchFilter
+
+INDEX_FILE = "faiss_index.bin"
+IDS_FILE = "message_ids.pkl"
+CURRENT_FILE = "CURRENT"
+PARTITIONS_DIR = "partitions"
+# Dimension and metric the directory was created with
+META_FILE = "store.json"
+
+# Delta log record: op, number of ids, byte length of the JSON id list
+_RECORD_HEADER = struct.Struct("<BII")
+_OP_ADD = 1
+_OP_DELETE = 2
+
+# Filtered searches with at most this many candidates are scored exactly
+_EXACT_SEARCH_LIMIT = 4096
+
+# Map index storage straight from the file; older FAISS releases can only map
+# IVF inverted lists
+_MMAP_FLAGS = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP) | (
+    faiss.IO_FLAG_READ_ONLY
+)
+
+# Times a partition load is retried after a concurrent merge swapped the
+# snapshot it was reading
+_LOAD_ATTEMPTS = 5
+
+_logger = logging.getLogger(__name__)
+
+_METRICS = ("cosine", "ip", "euclidean")
+_INDEX_TYPES = ("flat", "ivf_flat", "ivf_pq", "hnsw", "auto")
+
+# Fewest vectors an IVF index is trained on (k-means wants ~39 points per list)
+_MIN_TRAIN_VECTORS = {"ivf_flat": 1_000, "ivf_pq": 10_000}
+
+
+class _StaleSnapshot(Exception):
+    """``CURRENT`` moved while a partition was being loaded."""
+
+
+class _IndexBuilder:
+    """Creates, trains and tunes FAISS indexes for a given configuration."""
+
+    def __init__(
+        self,
+        dimension: int,
+        metric: str,
+        index_type: str,
+        nlist: Optional[int],
+        nprobe: int,
+        pq_m: int,
+        hnsw_m: int,
+        ef_search: int,
+        ivf_threshold: int,
+        pq_threshold: int,
+    ) -> None:
+        self.dimension = dimension
+        self.metric = metric
+        self.index_type = index_type
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.pq_m = pq_m
+        self.hnsw_m = hnsw_m
+        self.ef_search = ef_search
+        self.ivf_threshold = ivf_threshold
+        self.pq_threshold = pq_threshold
+
+    @property
+    def faiss_metric(self) -> int:
+        if self.metric == "euclidean":
+            return faiss.METRIC_L2
+        return faiss.METRIC_INNER_PRODUCT
+
+    def flat(self) -> faiss.Index:
+        if self.metric == "euclidean":
+            return faiss.IndexFlatL2(self.dimension)
+        return faiss.IndexFlatIP(self.dimension)
+
+    def nlist_for(self, n_vectors: int) -> int:
+        if self.nlist:
+            return self.nlist
+        return max(1, min(int(4 * math.sqrt(n_vectors)), n_vectors // 39))
+
+    def _trainable(self, kind: str, n_vectors: int) -> bool:
+        minimum = _MIN_TRAIN_VECTORS[kind]
+        if self.nlist:
+            minimum = max(minimum, 39 * self.nlist)
+        return n_vectors >= minimum
+
+    def target_kind(self, n_vectors: int) -> str:
+        """Index structure a partition holding ``n_vectors`` should use."""
+        kind = self.index_type
+        if kind == "auto":
+            if n_vectors >= self.pq_threshold:
+                kind = "ivf_pq"
+            elif n_vectors >= self.ivf_threshold:
+                kind = "ivf_flat"
+            else:
+                return "flat"
+        if kind in _MIN_TRAIN_VECTORS and not self._trainable(kind, n_vectors):
+            return "flat"
+        return kind
+
+    def build(self, kind: str, vectors: np.ndarray) -> faiss.Index:
+        """Build an index of ``kind``, trained on (but not containing) vectors."""
+        if kind == "flat":
+            return self.flat()
+        if kind == "hnsw":
+            index = faiss.IndexHNSWFlat(self.dimension, self.hnsw_m, self.faiss_metric)
+            self.tune(index)
+            return index
+
+        quantizer = self.flat()
+        nlist = self.nlist_for(len(vectors))
+        if kind == "ivf_flat":
+            index = faiss.IndexIVFFlat(
+                quantizer, self.dimension, nlist, self.faiss_metric
+            )
+        else:
+            index = faiss.IndexIVFPQ(
+                quantizer, self.dimension, nlist, self.pq_m, 8, self.faiss_metric
+            )
+        index.train(vectors)
+        # Keep a direct map so vectors can be reconstructed by position
+        index.set_direct_map_type(faiss.DirectMap.Array)
+        self.tune(index)
+        return index
+
+    def search_params(
+        self, index: faiss.Index, selector: faiss.IDSelector
+    ) -> faiss.SearchParameters:
+        """Search parameters restricting ``index`` to ``selector``."""
+        if isinstance(index, faiss.IndexHNSW):
+            return faiss.SearchParametersHNSW(
+                sel=selector, efSearch=index.hnsw.efSearch
+            )
+        if isinstance(index, faiss.IndexIVF):
+            return faiss.SearchParametersIVF(sel=selector, nprobe=index.nprobe)
+        return faiss.SearchParameters(sel=selector)
+
+    def tune(self, index: faiss.Index) -> None:
+        """Apply search-time parameters to a freshly built or loaded index."""
+        if isinstance(index, faiss.IndexHNSW):
+            index.hnsw.efSearch = self.ef_search
+        elif isinstance(index, faiss.IndexIVF):
+            index.nprobe = min(self.nprobe, index.nlist)
+
+
+def _fsync(path: Path) -> None:
+    """Flush a file or directory entry to stable storage."""
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _index_kind(index: faiss.Index) -> str:
+    if isinstance(index, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(index, faiss.IndexIVFPQ):
+        return "ivf_pq"
+    if isinstance(index, faiss.IndexIVF):
+        return "ivf_flat"
+    return "flat"
+
+
+class _Partition:
+    """One FAISS index plus the positional mapping to message ids.
+
+    ``ids[pos]`` is the message id stored at FAISS position ``pos``, or
+    ``None`` once it has been deleted (a tombstone).
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        builder: _IndexBuilder,
+        mmap: bool = False,
+        first_log: int = 1,
+    ) -> None:
+        self.path = path
+        self.builder = builder
+        self.mmap = mmap
+        self.index = builder.build(builder.target_kind(0), np.empty((0,)))
+        self.ids: List[Optional[str]] = []
+        # Live message id -> position, and one tombstone byte per position
+        self.positions: Dict[str, int] = {}
+        self.tombstones = bytearray()
+        self.n_deleted = 0
+        self._selectors: Dict[Tuple[int, int], tuple] = {}
+        # mmap mode: the mapped base is immutable, so logged adds go to a
+        # separate in-memory index searched alongside it
+        self.delta: Optional[faiss.Index] = builder.flat() if mmap else None
+        # Vector count the current ANN index was trained on
+        self.trained_on = 0
+        # Bumped by rebuilds, which renumber positions under a running rebuild
+        self.generation = 0
+        self.rebuilding = False
+        # Base snapshot / delta log bookkeeping
+        self.base_generation = 0
+        # Numbering continues past a dropped predecessor in the same directory
+        # so its in-flight merge never touches this partition's files
+        self.log_number = first_log
+        self.delta_records = 0
+        # Logs appended to since the last sync(), and whether a log (or the
+        # partition directory itself) was created
+        self.unsynced_logs: Set[int] = set()
+        self.new_log = False
+        self.new_dir = False
+        self.merging = False
+        self.merge_again = False
+        self.dropped = False
+
+    def _base_files(self, generation: int) -> Tuple[Path, Path]:
+        if generation == 0:
+            return self.path / INDEX_FILE, self.path / IDS_FILE
+        stem = f"base-{generation:08d}"
+        return self.path / f"{stem}.index", self.path / f"{stem}.ids"
+
+    def _log_path(self, number: int) -> Path:
+        return self.path / f"delta-{number:08d}.log"
+
+    def _log_numbers(self) -> List[int]:
+        return sorted(int(p.stem.split("-")[1]) for p in self.path.glob("delta-*.log"))
+
+    def _base_generations(self) -> List[int]:
+        return sorted({int(p.stem.split("-")[1]) for p in self.path.glob("base-*")})
+
+    def _read_current(self) -> Optional[int]:
+        """Generation named by ``CURRENT`` (``None`` if there is none)."""
+        try:
+            return int((self.path / CURRENT_FILE).read_text().strip())
+        except FileNotFoundError:
+            return None
+
+    def load(self) -> None:
+        """Load the base snapshot named by ``CURRENT`` and replay its logs.
+
+        A merge in another process may publish a new snapshot and delete the
+        files being read; that raises ``_StaleSnapshot`` so the caller can
+        retry on a fresh partition. Missing or unreadable files while
+        ``CURRENT`` is unchanged are a real inconsistency and are raised.
+        """
+        current = self._read_current()
+        try:
+            self._load(current)
+        except (OSError, EOFError, pickle.UnpicklingError, RuntimeError) as e:
+            if self._read_current() != current:
+                raise _StaleSnapshot(self.path) from e
+            raise
+        if self._read_current() != current:
+            raise _StaleSnapshot(self.path)
+
+    def _load(self, current: Optional[int]) -> None:
+        self.base_generation = current or 0
+        index_file, ids_file = self._base_files(self.base_generation)
+        if current or index_file.exists() or ids_file.exists():
+            flags = _MMAP_FLAGS if self.mmap else 0
+            # faiss reports a missing file as a RuntimeError; check first so
+            # it surfaces as one
+            if not index_file.exists():
+                raise FileNotFoundError(f"Missing base snapshot {index_file}")
+            self.index = faiss.read_index(str(index_file), flags)
+            with open(ids_file, "rb") as f:
+                self.reset_ids(pickle.load(f))
+            if self.index.d != self.builder.dimension:
+                raise ValueError(
+                    f"Index at {index_file} has dimension {self.index.d}, "
+                    f"expected {self.builder.dimension}"
+                )
+
+        self.builder.tune(self.index)
+        if _index_kind(self.index) != "flat":
+            self.trained_on = self.live
+
+        logs = [n for n in self._log_numbers() if n > self.base_generation]
+        for number in logs:
+            self._replay(self._log_path(number))
+        # Never append after a possibly torn record: start a fresh log
+        self.log_number = max(logs + [self.base_generation]) + 1
+
+    def _replay(self, log_path: Path) -> None:
+        """Apply the records of one delta log to the in-memory index."""
+        with open(log_path, "rb") as f:
+            data = f.read()
+
+        offset = 0
+        vector_size = self.builder.dimension * 4
+        while offset + _RECORD_HEADER.size <= len(data):
+            op, count, ids_size = _RECORD_HEADER.unpack_from(data, offset)
+            body = offset + _RECORD_HEADER.size
+            end = body + ids_size + (count * vector_size if op == _OP_ADD else 0)
+            if end > len(data):
+                break  # torn write at the tail of the log
+            ids = json.loads(data[body : body + ids_size].decode("utf-8"))
+            if op == _OP_ADD:
+                vectors = np.frombuffer(
+                    data,
+                    dtype=np.float32,
+                    count=count * self.builder.dimension,
+                    offset=body + ids_size,
+                ).reshape(count, self.builder.dimension)
+                self._add(vectors, ids)
+            else:
+                self._delete(ids)
+            self.delta_records += count
+            offset = end
+
+    def _append(self, op: int, ids: List[str], vectors: Optional[np.ndarray]) -> None:
+        """Append one record to the active delta log.
+
+        The log is opened for each record rather than held open, so a store
+        with many partitions does not keep a file descriptor per partition.
+        """
+        encoded = json.dumps(ids).encode("utf-8")
+        record = [_RECORD_HEADER.pack(op, len(ids), len(encoded)), encoded]
+        if vectors is not None:
+            record.append(np.ascontiguousarray(vectors, dtype=np.float32).tobytes())
+
+        log_path = self._log_path(self.log_number)
+        if self.log_number not in self.unsynced_logs:
+            self.new_log = self.new_log or not log_path.exists()
+        try:
+            log = open(log_path, "ab")
+        except FileNotFoundError:
+            self.path.mkdir(parents=True, exist_ok=True)
+            self.new_dir = True
+            log = open(log_path, "ab")
+        with log:
+            log.write(b"".join(record))
+        self.unsynced_logs.add(self.log_number)
+        self.delta_records += len(ids)
+
+    def take_unsynced(self) -> List[Path]:
+        """Files to fsync so that every record appended so far is durable
+        (the logs, plus the directories whose entries were created); resets
+        the tracking."""
+        paths = [self._log_path(number) for number in sorted(self.unsynced_logs)]
+        if self.new_log or self.new_dir:
+            paths.append(self.path)
+        if self.new_dir:
+            # The partition directory, and possibly partitions/ above it
+            paths += [self.path.parent, self.path.parent.parent]
+        self.unsynced_logs = set()
+        self.new_log = self.new_dir = False
+        return paths
+
+    def snapshot(self) -> Tuple[int, faiss.Index, List[Optional[str]]]:
+        """Rotate the delta log and freeze the index state it covers.
+
+        Must be called under the store lock. Until ``thaw``, adds go to a
+        separate delta index, so the returned index is not modified while
+        ``write_base`` writes it outside the lock; nothing is copied but the
+        id list. Deletes made meanwhile are in the new log.
+        """
+        generation = self.log_number
+        self.log_number += 1
+        self.delta_records = 0
+        self.delta = self.builder.flat()
+        return generation, self.index, self.ids[: self.index.ntotal]
+
+    def thaw(self, frozen: faiss.Index) -> None:
+        """Fold the vectors added since ``snapshot`` back into the index.
+
+        Must be called under the store lock. A rebuild that swapped the index
+        meanwhile has already taken them in.
+        """
+        if self.index is not frozen or self.delta is None:
+            return
+        if self.delta.ntotal:
+            self.index.add(self.delta.reconstruct_n(0, self.delta.ntotal))
+        self.delta = None
+
+    def write_base(
+        self, generation: int, index: faiss.Index, ids: List[Optional[str]]
+    ) -> None:
+        """Write (and sync) the base snapshot files of ``generation``."""
+        self.path.mkdir(parents=True, exist_ok=True)
+        index_file, ids_file = self._base_files(generation)
+        faiss.write_index(index, str(index_file))
+        _fsync(index_file)
+        with open(ids_file, "wb") as f:
+            pickle.dump(ids, f)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def discard_base(self, generation: int) -> None:
+        """Delete the base files of an unpublished ``generation``."""
+        for path in self._base_files(generation):
+            path.unlink(missing_ok=True)
+
+    def publish(self, generation: int) -> None:
+        """Atomically make ``generation`` the live base snapshot.
+
+        The base files must already be synced: ``cleanup`` deletes the logs
+        they replace right after.
+        """
+        tmp = self.path / f"{CURRENT_FILE}.tmp"
+        with open(tmp, "w") as f:
+            f.write(str(generation))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path / CURRENT_FILE)
+        _fsync(self.path)
+        self.base_generation = generation
+
+    def cleanup(self, generation: int) -> None:
+        """Delete logs merged into ``generation`` and older base files.
+
+        Only numbers up to ``generation`` are touched, so files of a newer
+        partition for the same namespace (see ``first_log``) survive a
+        cleanup that races with ``delete_namespace``.
+        """
+        for number in self._log_numbers():
+            if number <= generation:
+                self._log_path(number).unlink(missing_ok=True)
+        for number in self._base_generations():
+            if number < generation:
+                self.discard_base(number)
+        self.discard_base(0)
+
+    def destroy(self) -> None:
+        """Delete every file this partition owns from disk."""
+        for path in [
+            self.path / CURRENT_FILE,
+            self.path / f"{CURRENT_FILE}.tmp",
+            *self._base_files(0),
+            *self.path.glob("base-*"),
+            *self.path.glob("delta-*.log"),
+        ]:
+            path.unlink(missing_ok=True)
+
+    def reset_ids(self, ids: List[Optional[str]]) -> None:
+        """Replace the id list and rebuild the id map and tombstones from it."""
+        self.ids = ids
+        self.positions = {mid: pos for pos, mid in enumerate(ids) if mid is not None}
+        self.tombstones = bytearray(mid is None for mid in ids)
+        self.n_deleted = len(ids) - len(self.positions)
+        self._selectors = {}
+
+    @property
+    def ntotal(self) -> int:
+        return self.index.ntotal + (self.delta.ntotal if self.delta is not None else 0)
+
+    @property
+    def live(self) -> int:
+        return self.ntotal - self.n_deleted
+
+    def add(self, vectors: np.ndarray, ids: List[str]) -> None:
+        self._add(vectors, ids)
+        self._append(_OP_ADD, ids, vectors)
+
+    def _add(self, vectors: np.ndarray, ids: List[str]) -> None:
+        # Re-adding an id replaces it: tombstone the previous copy
+        self._delete([mid for mid in ids if mid in self.positions])
+        (self.delta if self.delta is not None else self.index).add(vectors)
+        start = len(self.ids)
+        self.ids.extend(ids)
+        self.positions.update((mid, start + i) for i, mid in enumerate(ids))
+        self.tombstones.extend(bytes(len(ids)))
+        self._selectors = {}
+
+    def remove(self, vector_ids: List[str]) -> int:
+        removed = self._delete(vector_ids)
+        if removed:
+            self._append(_OP_DELETE, removed, None)
+        return len(removed)
+
+    def _delete(self, vector_ids: List[str]) -> List[str]:
+        """Tombstone the given ids; returns the ones that were present."""
+        removed = []
+        for vector_id in vector_ids:
+            pos = self.positions.pop(vector_id, None)
+            if pos is None:
+                continue
+            self.ids[pos] = None
+            self.tombstones[pos] = 1
+            removed.append(vector_id)
+        if removed:
+            self.n_deleted += len(removed)
+            self._selectors = {}
+        return removed
+
+    def _selector(
+        self, start: int, stop: int, excluded: Optional[np.ndarray] = None
+    ) -> tuple:
+        """Selector excluding tombstoned positions in ``[start, stop)``, and
+        the ``excluded`` positions if given.
+
+        The selector is the first item; the rest keep the objects it points
+        into alive and must be held for as long as it is used.
+        """
+        cached = self._selectors.get((start, stop)) if excluded is None else None
+        if cached is None:
+            # packbits copies, so no view into the growable bytearray survives
+            mask = np.frombuffer(self.tombstones, np.uint8, stop - start, start)
+            if excluded is not None:
+                mask = mask.copy()
+                mask[excluded[(excluded >= start) & (excluded < stop)] - start] = 1
+            bitmap = np.packbits(mask, bitorder="little")
+            deleted = faiss.IDSelectorBitmap(stop - start, faiss.swig_ptr(bitmap))
+            cached = (faiss.IDSelectorNot(deleted), deleted, bitmap)
+            if excluded is None:
+                self._selectors[(start, stop)] = cached
+        return cached
+
+    def search(
+        self,
+        query: np.ndarray,
+        k: int,
+        allowed_ids: Optional[FrozenSet[str]] = None,
+        excluded_ids: Optional[FrozenSet[str]] = None,
+    ) -> List[Tuple[str, float]]:
+        allowed = excluded = None
+        if allowed_ids is not None and excluded_ids:
+            allowed_ids = allowed_ids - excluded_ids
+        elif excluded_ids:
+            excluded = np.array(
+                [
+                    pos
+                    for pos in map(self.positions.get, excluded_ids)
+                    if pos is not None
+                ],
+                dtype=np.int64,
+            )
+            if not len(excluded):
+                excluded = None
+        if allowed_ids is not None:
+            allowed = np.array(
+                sorted(
+                    pos
+                    for pos in map(self.positions.get, allowed_ids)
+                    if pos is not None
+                ),
+                dtype=np.int64,
+            )
+            # Small candidate sets are cheaper (and exact) to score directly;
+            # ANN indexes also lose recall under very selective filters
+            if len(allowed) <= _EXACT_SEARCH_LIMIT:
+                return self._search_exact(query, k, allowed)
+
+        results = self._search_index(self.index, query, k, 0, allowed, excluded)
+        if self.delta is not None:
+            results += self._search_index(
+                self.delta, query, k, self.index.ntotal, allowed, excluded
+            )
+            results.sort(key=lambda hit: hit[1], reverse=True)
+        return results[:k]
+
+    def _search_index(
+        self,
+        index: faiss.Index,
+        query: np.ndarray,
+        k: int,
+        offset: int,
+        allowed: Optional[np.ndarray] = None,
+        excluded: Optional[np.ndarray] = None,
+    ) -> List[Tuple[str, float]]:
+        k = min(k, index.ntotal)
+        if k <= 0:
+            return []
+
+        params = selector = None
+        if allowed is not None:
+            # Allowed positions are live by construction: no tombstone check
+            local = allowed[(allowed >= offset) & (allowed < offset + index.ntotal)]
+            local = np.ascontiguousarray(local - offset)
+            if not len(local):
+                return []
+            selector = faiss.IDSelectorBatch(len(local), faiss.swig_ptr(local))
+            params = self.builder.search_params(index, selector)
+        elif self.n_deleted or excluded is not None:
+            selector = self._selector(offset, offset + index.ntotal, excluded)
+            params = self.builder.search_params(index, selector[0])
+        scores, positions = index.search(query, k, params=params)
+
+        results = []
+        for score, pos in zip(scores[0], positions[0]):
+            if pos < 0:
+                continue
+            vector_id = self.ids[offset + pos]
+            if vector_id is None:
+                continue
+            results.append((vector_id, self._similarity(score)))
+        return results
+
+    def _search_exact(
+        self, query: np.ndarray, k: int, allowed: np.ndarray
+    ) -> List[Tuple[str, float]]:
+        """Score the allowed positions directly instead of searching the index."""
+        if not len(allowed):
+            return []
+
+        base_size = self.index.ntotal
+        split = int(np.searchsorted(allowed, base_size))
+        parts = []
+        if split:
+            parts.append(self.index.reconstruct_batch(allowed[:split]))
+        if split < len(allowed):
+            parts.append(self.delta.reconstruct_batch(allowed[split:] - base_size))
+        vectors = np.vstack(parts)
+
+        if self.builder.metric == "euclidean":
+            scores = ((vectors - query[0]) ** 2).sum(axis=1)
+            order = np.argsort(scores)[:k]
+        else:
+            scores = vectors @ query[0]
+            order = np.argsort(-scores)[:k]
+        return [(self.ids[allowed[i]], self._similarity(scores[i])) for i in order]
+
+    def _similarity(self, score: float) -> float:
+        if self.builder.metric == "euclidean":
+            # Turn an L2 distance into a "higher is better" similarity
+            return 1.0 / (1.0 + float(score))
+        return float(score)
+
+    def vectors(self, start: int = 0) -> np.ndarray:
+        """Reconstruct the stored vectors (index, then delta) from position
+        ``start`` onwards."""
+        parts = [np.empty((0, self.builder.dimension), dtype=np.float32)]
+        base_size = self.index.ntotal
+        if start < base_size:
+            parts.append(self.index.reconstruct_n(start, base_size - start))
+        if self.delta is not None and self.delta.ntotal:
+            offset = max(start - base_size, 0)
+            if offset < self.delta.ntotal:
+                parts.append(
+                    self.delta.reconstruct_n(offset, self.delta.ntotal - offset)
+                )
+        return np.vstack(parts)
+
+    @property
+    def lossy(self) -> bool:
+        """Whether reconstructed vectors are only approximations (PQ codes)."""
+        return _index_kind(self.index) == "ivf_pq"
+
+    def needs_rebuild(self, compact_ratio: float, exact: bool = False) -> bool:
+        """Whether the index should be compacted, re-trained or restructured.
+
+        Without ``exact`` source vectors a lossy index is only rebuilt when
+        its structure must change: re-encoding decoded vectors compounds the
+        quantization error on every rebuild.
+        """
+        n_vectors = self.live
+        kind = _index_kind(self.index)
+        if self.builder.target_kind(n_vectors) != kind:
+            return True
+        if self.lossy and not exact:
+            return False
+        if self.n_deleted and self.n_deleted >= compact_ratio * self.ntotal:
+            return True
+        # IVF list counts scale with the corpus; retrain once it has doubled
+        return (
+            kind in _MIN_TRAIN_VECTORS
+            and not self.builder.nlist
+            and n_vectors >= 2 * self.trained_on
+        )
+
+
+class FAISSVectorStore(BaseVectorStore):
+    """Vector store backed by local FAISS indexes.
+
+    Parameters
+    - vector_dir: Directory holding the persisted index files.
+    - dimension: Embedding dimension.
+    - metric: ``"cosine"`` (default), ``"ip"`` or ``"euclidean"``.
+    - partitioned: Keep a separate index per namespace (user).
+    - index_type: ``"flat"``, ``"ivf_flat"``, ``"ivf_pq"``, ``"hnsw"`` or ``"auto"``.
+    - nlist: IVF list count (default: scaled to the partition size).
+    - nprobe: IVF lists visited per query.
+    - pq_m: PQ sub-quantizers for ``ivf_pq`` (must divide ``dimension``).
+    - hnsw_m / ef_search: HNSW graph degree and search breadth.
+    - ivf_threshold / pq_threshold: Vector counts at which ``"auto"`` switches
+      to ``ivf_flat`` and ``ivf_pq``.
+    - background_train: Train and compact indexes in a background thread;
+      searches keep using the previous index until the new one is swapped in.
+    - compact_ratio: Share of tombstoned vectors at which a partition is
+      rebuilt without them.
+    - merge_threshold: Delta log records after which a partition's logs are
+      merged into a new base snapshot in the background.
+    - mmap: Open read-only with memory-mapped base snapshots (for reader
+      processes sharing a directory with a single writer).
+    """
+
+    def __init__(
+        self,
+        vector_dir: str = "vectors",
+        dimension: int = 384,
+        metric: str = "cosine",
+        partitioned: bool = False,
+        index_type: str = "flat",
+        nlist: Optional[int] = None,
+        nprobe: int = 16,
+        pq_m: int = 48,
+        hnsw_m: int = 32,
+        ef_search: int = 64,
+        ivf_threshold: int = 50_000,
+        pq_threshold: int = 1_000_000,
+        background_train: bool = True,
+        compact_ratio: float = 0.2,
+        merge_threshold: int = 10_000,
+        mmap: bool = False,
+    ) -> None:
+        if metric not in _METRICS:
+            raise ValueError(
+                f"Unsupported metric {metric!r}; expected one of {_METRICS}"
+            )
+        if index_type not in _INDEX_TYPES:
+            raise ValueError(
+                f"Unsupported index_type {index_type!r}; expected one of {_INDEX_TYPES}"
+            )
+        if index_type in ("ivf_pq", "auto") and dimension % pq_m:
+            raise ValueError(f"pq_m={pq_m} must divide dimension={dimension}")
+
+        self.vector_dir = Path(vector_dir)
+        self.vector_dir.mkdir(parents=True, exist_ok=True)
+        self.dimension = dimension
+        self.metric = metric
+        self.partitioned = partitioned
+        self.index_type = index_type
+        self.background_train = background_train
+        self.compact_ratio = compact_ratio
+        self.merge_threshold = merge_threshold
+        self.mmap = mmap
+        self.read_only = mmap
+        self._builder = _IndexBuilder(
+            dimension=dimension,
+            metric=metric,
+            index_type=index_type,
+            nlist=nlist,
+            nprobe=nprobe,
+            pq_m=pq_m,
+            hnsw_m=hnsw_m,
+            ef_search=ef_search,
+            ivf_threshold=ivf_threshold,
+            pq_threshold=pq_threshold,
+        )
+        self._lock = threading.RLock()
+        self._partitions: Dict[str, _Partition] = {}
+        # Next file number for partitions re-created after a drop
+        self._retired: Dict[str, int] = {}
+        # Failed background rebuilds/merges, reported by get_stats()
+        self._background_failures = 0
+        self._last_background_error: Optional[str] = None
+        # Directories whose entries changed (dropped partitions) since sync()
+        self._unsynced_dirs: Set[Path] = set()
+        self._threads: List[threading.Thread] = []
+        self._check_meta()
+        self._load_existing_vectors()
+
+    def _partition_path(self, key: str) -> Path:
+        if not self.partitioned:
+            return self.vector_dir
+        return self.vector_dir / PARTITIONS_DIR / key
+
+    def _partition_key(self, namespace: Optional[str]) -> str:
+        if not self.partitioned:
+            return ""
+        if namespace is None:
+            raise ValueError("A namespace is required when partitioned=True")
+        return hashlib.sha1(namespace.encode("utf-8")).hexdigest()
+
+    def _load_existing_vectors(self) -> None:
+        """Load every persisted partition from ``vector_dir``."""
+        if self.partitioned:
+            root = self.vector_dir / PARTITIONS_DIR
+            keys = (
+                [p.name for p in root.iterdir() if p.is_dir()] if root.exists() else []
+            )
+        else:
+            keys = [""]
+
+        for key in keys:
+            partition = self._load_partition(key)
+            self._partitions[key] = partition
+            if not self.mmap:
+                self._maybe_rebuild(partition)
+                self._maybe_merge(partition)
+
+    def _load_partition(self, key: str) -> _Partition:
+        """Load one partition, starting over if a concurrent merge replaced
+        its snapshot mid-load."""
+        path = self._partition_path(key)
+        for _ in range(_LOAD_ATTEMPTS):
+            partition = _Partition(path, self._builder, self.mmap)
+            try:
+                partition.load()
+            except _StaleSnapshot:
+                continue
+            return partition
+        raise RuntimeError(
+            f"FAISS partition at {path} kept changing during "
+            f"{_LOAD_ATTEMPTS} load attempts"
+        )
+
+    def _check_meta(self) -> None:
+        """Refuse to open a directory written with another dimension or metric."""
+        meta_path = self.vector_dir / META_FILE
+        meta = {"dimension": self.dimension, "metric": self.metric}
+        if meta_path.exists():
+            stored = json.loads(meta_path.read_text())
+            if stored != meta:
+                raise ValueError(
+                    f"FAISS store at {self.vector_dir} was created with {stored}, "
+                    f"not {meta}"
+                )
+        elif not self.mmap:
+            meta_path.write_text(json.dumps(meta))
+
+    def _check_writable(self) -> None:
+        if self.mmap:
+            raise RuntimeError(
+                f"FAISS store at {self.vector_dir} was opened with mmap=True "
+                "and is read-only"
+            )
+
+    def refresh(self) -> None:
+        """Re-open a read-only store to see the writer's latest state.
+
+        Writable stores always hold the latest state, so this is a no-op.
+        """
+        if not self.mmap:
+            return
+        with self._lock:
+            self._partitions = {}
+            self._load_existing_vectors()
+
+    def _get_partition(
+        self, namespace: Optional[str], create: bool
+    ) -> Optional[_Partition]:
+        key = self._partition_key(namespace)
+        partition = self._partitions.get(key)
+        if partition is None and create:
+            partition = _Partition(
+                self._partition_path(key),
+                self._builder,
+                first_log=self._retired.pop(key, 1),
+            )
+            self._partitions[key] = partition
+        return partition
+
+    def _maybe_rebuild(self, partition: _Partition) -> None:
+        """Start compacting or (re)training a partition's index if needed."""
+        if partition.rebuilding or not partition.needs_rebuild(
+            self.compact_ratio, exact=self.vector_source is not None
+        ):
+            return
+
+        partition.rebuilding = True
+        if not self.background_train:
+            self._rebuild(partition)
+            return
+
+        self._spawn(self._rebuild, partition, "cortex-faiss-rebuild")
+
+    def _spawn(self, target, partition: _Partition, name: str) -> None:
+        thread = threading.Thread(target=target, args=(partition,), name=name)
+        thread.daemon = True
+        self._threads = [t for t in self._threads if t.is_alive()]
+        self._threads.append(thread)
+        thread.start()
+
+    def _rebuild(self, partition: _Partition) -> None:
+        """Rebuild an index from its live vectors, then swap it in under the lock.
+
+        Drops tombstones and moves the partition to the index structure its
+        size calls for. Expects ``partition.rebuilding`` to be set.
+        """
+        try:
+            with self._lock:
+                generation = partition.generation
+                lossy = partition.lossy
+                snapshot_size = partition.ntotal
+                keep = np.flatnonzero(
+                    np.frombuffer(partition.tombstones, np.uint8, snapshot_size) == 0
+                )
+                ids = [partition.ids[pos] for pos in keep]
+                vectors = partition.vectors()[keep]
+
+            # Training and bulk insertion run without holding the store lock
+            if lossy:
+                self._restore_exact(vectors, ids)
+            kind = self._builder.target_kind(len(vectors))
+            index = self._builder.build(kind, vectors)
+            index.add(vectors)
+
+            # Catch up on vectors appended while we were building; deletes
+            # made meanwhile carry over as tombstones in the id list
+            caught_up = snapshot_size
+            while True:
+                with self._lock:
+                    if partition.generation != generation:
+                        return  # dropped or rebuilt underneath us
+                    if partition.ntotal == caught_up:
+                        ids = [partition.ids[pos] for pos in keep]
+                        ids += partition.ids[snapshot_size:]
+                        partition.index = index
+                        # The rebuilt index holds the delta's vectors too; a
+                        # merge writing the old index no longer needs them
+                        partition.delta = None
+                        partition.reset_ids(ids)
+                        partition.trained_on = len(vectors) if kind != "flat" else 0
+                        partition.generation += 1
+                        # Persist the new index structure with the next snapshot
+                        self._start_merge(partition)
+                        return
+                    appended = partition.vectors(start=caught_up)
+                    appended_ids = partition.ids[caught_up:]
+                    caught_up = partition.ntotal
+                if lossy:
+                    self._restore_exact(appended, appended_ids)
+                index.add(appended)
+        except Exception as e:
+            self._background_failed("Rebuilding", partition, e)
+        finally:
+            partition.rebuilding = False
+
+    def _restore_exact(self, vectors: np.ndarray, ids: List[Optional[str]]) -> None:
+        """Overwrite decoded rows of ``vectors`` with the exact vectors from
+        ``vector_source``, where it has them."""
+        if self.vector_source is None:
+            return
+        exact = self.vector_source([vector_id for vector_id in ids if vector_id])
+        for row, vector_id in enumerate(ids):
+            vector = exact.get(vector_id) if vector_id else None
+            if vector is not None and vector.size == self.dimension:
+                vectors[row] = self._prepare(vector)[0]
+
+    def _maybe_merge(self, partition: _Partition) -> None:
+        if partition.delta_records >= self.merge_threshold:
+            self._start_merge(partition)
+
+    def _start_merge(self, partition: _Partition) -> None:
+        """Merge a partition's delta logs into a new base in the background."""
+        with self._lock:
+            if partition.merging:
+                partition.merge_again = True
+                return
+            partition.merging = True
+        self._spawn(self._merge, partition, "cortex-faiss-merge")
+
+    def _merge(self, partition: _Partition) -> None:
+        try:
+            while True:
+                with self._lock:
+                    partition.merge_again = False
+                    if partition.dropped:
+                        return
+                    generation, frozen, ids = partition.snapshot()
+
+                # Writing the snapshot is the expensive part; adds keep going
+                # to the freshly rotated delta log meanwhile
+                try:
+                    partition.write_base(generation, frozen, ids)
+                finally:
+                    with self._lock:
+                        partition.thaw(frozen)
+
+                with self._lock:
+                    if partition.dropped:
+                        # The directory may already belong to a new partition
+                        # for the namespace: remove only what we wrote
+                        partition.discard_base(generation)
+                        return
+                    partition.publish(generation)
+                partition.cleanup(generation)
+
+                if not partition.merge_again:
+                    return
+        except Exception as e:
+            self._background_failed("Merging", partition, e)
+        finally:
+            partition.merging = False
+
+    def _background_failed(
+        self, task: str, partition: _Partition, error: Exception
+    ) -> None:
+        """Log a failed background rebuild or merge and count it for
+        ``get_stats``."""
+        _logger.error(
+            "%s the FAISS partition at %s failed", task, partition.path, exc_info=error
+        )
+        with self._lock:
+            self._background_failures += 1
+            self._last_background_error = f"{task} {partition.path}: {error!r}"
+
+    def compact(self) -> None:
+        """Synchronously drop tombstones and merge every partition's delta
+        logs into its base.
+
+        ``ivf_pq`` partitions keep their tombstones unless ``vector_source``
+        can supply the exact vectors to re-encode.
+        """
+        self._check_writable()
+        self._join_threads()
+        with self._lock:
+            partitions = list(self._partitions.values())
+        for partition in partitions:
+            if partition.n_deleted and (
+                not partition.lossy or self.vector_source is not None
+            ):
+                partition.rebuilding = True
+                self._rebuild(partition)
+            self._start_merge(partition)
+        self._join_threads()
+
+    def _join_threads(self) -> None:
+        while True:
+            with self._lock:
+                alive = [t for t in self._threads if t.is_alive()]
+            if not alive:
+                return
+            for thread in alive:
+                thread.join()
+
+    def _prepare(self, vectors: np.ndarray) -> np.ndarray:
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32).reshape(
+            -1, self.dimension
+        )
+        if self.metric == "cosine":
+            vectors = vectors.copy()
+            faiss.normalize_L2(vectors)
+        return vectors
+
+    def add_vectors(
+        self,
+        vectors: np.ndarray,
+        ids: List[str],
+        namespace: Optional[str] = None,
+        metadata: Optional[List[Dict[str, Any]]] = None,
+    ) -> None:
+        self._check_writable()
+        vectors = self._prepare(vectors)
+        if len(vectors) != len(ids):
+            raise ValueError("vectors and ids must have the same length")
+
+        with self._lock:
+            partition = self._get_partition(namespace, create=True)
+            partition.add(vectors, list(ids))
+            self._maybe_rebuild(partition)
+            self._maybe_merge(partition)
+
+    def search_similar(
+        self,
+        query_vector: np.ndarray,
+        k: int = 10,
+        namespace: Optional[str] = None,
+        filter: Optional[SearchFilter] = None,
+    ) -> List[Tuple[str, float]]:
+        allowed_ids = excluded_ids = None
+        if filter is not None:
+            if filter.message_ids is None and filter.exclude_message_ids is None:
+                raise ValueError(
+                    "The FAISS backend keeps no message metadata; resolve the "
+                    "filter to SearchFilter.message_ids first"
+                )
+            allowed_ids = filter.message_ids
+            excluded_ids = filter.exclude_message_ids
+
+        query = self._prepare(query_vector)
+        with self._lock:
+            partition = self._get_partition(namespace, create=False)
+            if partition is None:
+                return []
+            return partition.search(query, k, allowed_ids, excluded_ids)
+
+    def delete_vector(self, vector_id: str, namespace: Optional[str] = None) -> bool:
+        return self.delete_vectors([vector_id], namespace=namespace) > 0
+
+    def delete_vectors(self, ids: List[str], namespace: Optional[str] = None) -> int:
+        self._check_writable()
+        with self._lock:
+            partition = self._get_partition(namespace, create=False)
+            if partition is None:
+                return 0
+            removed = partition.remove(list(ids))
+            if removed:
+                self._maybe_rebuild(partition)
+                self._maybe_merge(partition)
+            return removed
+
+    def delete_namespace(self, namespace: str) -> int:
+        if not self.partitioned:
+            return super().delete_namespace(namespace)
+
+        self._check_writable()
+        with self._lock:
+            key = self._partition_key(namespace)
+            partition = self._partitions.pop(key, None)
+            if partition is None:
+                return 0
+            partition.generation += 1
+            partition.dropped = True
+            self._retired[key] = partition.log_number
+            shutil.rmtree(partition.path, ignore_errors=True)
+            self._unsynced_dirs.add(partition.path.parent)
+            return partition.live
+
+    def clear(self) -> None:
+        self._check_writable()
+        self._join_threads()
+        with self._lock:
+            for key, partition in self._partitions.items():
+                partition.generation += 1
+                partition.dropped = True
+                self._retired[key] = partition.log_number
+                partition.destroy()
+                self._unsynced_dirs.add(partition.path)
+            self._partitions = {}
+            if self.partitioned:
+                shutil.rmtree(self.vector_dir / PARTITIONS_DIR, ignore_errors=True)
+                self._unsynced_dirs = {self.vector_dir}
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "backend": "faiss",
+                "vector_dir": str(self.vector_dir),
+                "dimension": self.dimension,
+                "metric": self.metric,
+                "partitioned": self.partitioned,
+                "partitions": len(self._partitions),
+                "index_type": self.index_type,
+                "index_kinds": sorted(
+                    {_index_kind(p.index) for p in self._partitions.values()}
+                ),
+                "mmap": self.mmap,
+                "total_vectors": sum(p.live for p in self._partitions.values()),
+                "tombstones": sum(p.n_deleted for p in self._partitions.values()),
+                "delta_records": sum(
+                    p.delta_records for p in self._partitions.values()
+                ),
+                "background_failures": self._background_failures,
+                "last_background_error": self._last_background_error,
+            }
+
+    def sync(self) -> None:
+        with self._lock:
+            paths = [
+                p for part in self._partitions.values() for p in part.take_unsynced()
+            ]
+            paths += sorted(self._unsynced_dirs)
+            self._unsynced_dirs = set()
+        # Outside the lock: a log merged away meanwhile is already covered by
+        # a published (fsynced) base, and a dropped directory needs nothing
+        for path in paths:
+            try:
+                _fsync(path)
+            except FileNotFoundError:
+                pass
+
+    def close(self) -> None:
+        self._join_threads()
@@ -0,0 +1,231 @@
+"""Pinecone vector store backend.
+
+Requires the optional ``pinecone`` extra (``pip install cortex-memory[pinecone]``)
+and the ``PINECONE_API_KEY`` / ``PINECONE_ENVIRONMENT`` environment variables.
+With ``partitioned=True`` each namespace maps onto a native Pinecone namespace.
+"""
+
+from __future__ import annotations
+
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .base import BaseVectorStore, SearchFilter, timestamp_to_epoch
+
+try:
+    import pinecone
+except ImportError:  # pragma: no cover - optional dependency
+    pinecone = None
+
+_DELETE_BATCH_SIZE = 1000
+
+
+class PineconeVectorStore(BaseVectorStore):
+    """Vector store backed by a Pinecone index.
+
+    Parameters
+    - index_name: Name of the Pinecone index (created if missing).
+    - dimension: Embedding dimension.
+    - metric: Pinecone distance metric (``cosine``, ``dotproduct``, ``euclidean``).
+    - api_key / environment: Override the ``PINECONE_*`` environment variables.
+    - partitioned: Store each namespace (user) in its own Pinecone namespace.
+
+    Search filters are translated into Pinecone metadata filters over the
+    ``role``, ``conversation_id`` and ``timestamp_epoch`` metadata written by
+    ``ConversationMemory``. Without partitioning, searches for a namespace
+    are also restricted to vectors whose ``user_id`` metadata matches it,
+    so ``top_k`` is not spent on other users' vectors. Vectors written
+    without that metadata (by 0.1.0) are still searched, unscoped, when the
+    scoped query comes back short, until ``rebuild_vector_index()`` rewrites
+    them.
+    """
+
+    supports_metadata_filter = True
+
+    def __init__(
+        self,
+        index_name: str = "cortex-vectors",
+        dimension: int = 384,
+        metric: str = "cosine",
+        api_key: Optional[str] = None,
+        environment: Optional[str] = None,
+        partitioned: bool = False,
+    ) -> None:
+        if pinecone is None:
+            raise ImportError(
+                "Pinecone support requires pinecone-client. "
+                "Install with: pip install cortex-memory[pinecone]"
+            )
+
+        api_key = api_key or os.getenv("PINECONE_API_KEY")
+        environment = environment or os.getenv("PINECONE_ENVIRONMENT")
+        if not api_key or not environment:
+            raise ValueError(
+                "Pinecone credentials required. Set PINECONE_API_KEY and "
+                "PINECONE_ENVIRONMENT or pass api_key/environment."
+            )
+
+        pinecone.init(api_key=api_key, environment=environment)
+        if index_name not in pinecone.list_indexes():
+            pinecone.create_index(index_name, dimension=dimension, metric=metric)
+        else:
+            existing = pinecone.describe_index(index_name).dimension
+            if existing != dimension:
+                raise ValueError(
+                    f"Pinecone index {index_name!r} has dimension {existing}, "
+                    f"expected {dimension}"
+                )
+
+        self.index_name = index_name
+        self.dimension = dimension
+        self.metric = metric
+        self.partitioned = partitioned
+        self.index = pinecone.Index(index_name)
+
+    def _namespace(self, namespace: Optional[str]) -> str:
+        if not self.partitioned:
+            return ""
+        if namespace is None:
+            raise ValueError("A namespace is required when partitioned=True")
+        return namespace
+
+    def add_vectors(
+        self,
+        vectors: np.ndarray,
+        ids: List[str],
+        namespace: Optional[str] = None,
+        metadata: Optional[List[Dict[str, Any]]] = None,
+    ) -> None:
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dimension)
+        if len(vectors) != len(ids):
+            raise ValueError("vectors and ids must have the same length")
+
+        metadata = metadata or [{} for _ in ids]
+        items = [
+            (vector_id, vector.tolist(), meta)
+            for vector_id, vector, meta in zip(ids, vectors, metadata)
+        ]
+        self.index.upsert(vectors=items, namespace=self._namespace(namespace))
+
+    def _metadata_filter(
+        self, filter: Optional[SearchFilter], owner: Optional[Dict[str, Any]] = None
+    ) -> Optional[Dict[str, Any]]:
+        conditions: List[Dict[str, Any]] = [owner] if owner is not None else []
+        if filter is None:
+            return conditions[0] if conditions else None
+        if filter.message_ids is not None or filter.exclude_message_ids is not None:
+            raise ValueError("Pinecone cannot filter a query by vector id")
+
+        if filter.role is not None:
+            conditions.append({"role": {"$eq": filter.role}})
+        if filter.conversation_ids is not None:
+            conditions.append(
+                {"conversation_id": {"$in": sorted(filter.conversation_ids)}}
+            )
+        if filter.exclude_conversation_ids:
+            conditions.append(
+                {"conversation_id": {"$nin": sorted(filter.exclude_conversation_ids)}}
+            )
+        if filter.since is not None:
+            conditions.append(
+                {"timestamp_epoch": {"$gte": timestamp_to_epoch(filter.since)}}
+            )
+        if filter.until is not None:
+            conditions.append(
+                {"timestamp_epoch": {"$lt": timestamp_to_epoch(filter.until)}}
+            )
+
+        if not conditions:
+            return None
+        return conditions[0] if len(conditions) == 1 else {"$and": conditions}
+
+    def search_similar(
+        self,
+        query_vector: np.ndarray,
+        k: int = 10,
+        namespace: Optional[str] = None,
+        filter: Optional[SearchFilter] = None,
+    ) -> List[Tuple[str, float]]:
+        query = np.asarray(query_vector, dtype=np.float32).reshape(-1).tolist()
+        if self.partitioned or namespace is None:
+            return self._query(query, k, namespace, self._metadata_filter(filter))
+
+        # Every user shares one Pinecone namespace, so scope by owner
+        matches = self._query(
+            query,
+            k,
+            namespace,
+            self._metadata_filter(filter, {"user_id": {"$eq": namespace}}),
+        )
+        if len(matches) < k:
+            # Vectors written before user_id metadata was stored lack it; they
+            # are searched unscoped and left to the caller's ownership check
+            matches += self._query(
+                query,
+                k,
+                namespace,
+                self._metadata_filter(filter, {"user_id": {"$exists": False}}),
+            )
+            matches.sort(key=lambda match: match[1], reverse=self.metric != "euclidean")
+        return matches[:k]
+
+    def _query(
+        self,
+        query: List[float],
+        k: int,
+        namespace: Optional[str],
+        metadata_filter: Optional[Dict[str, Any]],
+    ) -> List[Tuple[str, float]]:
+        response = self.index.query(
+            vector=query,
+            top_k=k,
+            namespace=self._namespace(namespace),
+            filter=metadata_filter,
+            include_values=False,
+        )
+        return [(match["id"], float(match["score"])) for match in response["matches"]]
+
+    def delete_vector(self, vector_id: str, namespace: Optional[str] = None) -> bool:
+        self.index.delete(ids=[vector_id], namespace=self._namespace(namespace))
+        return True
+
+    def delete_vectors(self, ids: List[str], namespace: Optional[str] = None) -> int:
+        # Pinecone caps the number of ids per delete request
+        for start in range(0, len(ids), _DELETE_BATCH_SIZE):
+            self.index.delete(
+                ids=ids[start : start + _DELETE_BATCH_SIZE],
+                namespace=self._namespace(namespace),
+            )
+        return len(ids)
+
+    def delete_namespace(self, namespace: str) -> int:
+        if not self.partitioned:
+            return super().delete_namespace(namespace)
+
+        stats = self.index.describe_index_stats()
+        count = stats.get("namespaces", {}).get(namespace, {}).get("vector_count", 0)
+        self.index.delete(delete_all=True, namespace=namespace)
+        return int(count)
+
+    def clear(self) -> None:
+        if self.partitioned:
+            stats = self.index.describe_index_stats()
+            namespaces = list(stats.get("namespaces", {}))
+        else:
+            namespaces = [""]
+        for namespace in namespaces:
+            self.index.delete(delete_all=True, namespace=namespace)
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = self.index.describe_index_stats()
+        return {
+            "backend": "pinecone",
+            "index_name": self.index_name,
+            "dimension": self.dimension,
+            "metric": self.metric,
+            "partitioned": self.partitioned,
+            "partitions": len(stats.get("namespaces", {})),
+            "total_vector_count": stats.get("total_vector_count", 0),
+        }
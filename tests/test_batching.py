@@ -0,0 +1,89 @@
+"""Request coalescing in ``BatchingEmbedder``."""
+
+import threading
+import time
+from typing import List
+
+import numpy as np
+import pytest
+
+from memory.embedders import Embedder
+from memory.embedders.batching import BatchingEmbedder
+
+DIM = 4
+
+
+class RecordingEmbedder(Embedder):
+    """Encodes text ``t`` as a row of ``len(t)``; the first call blocks until
+    released, so requests can queue up behind it."""
+
+    model_id = "test-recording"
+
+    def __init__(self) -> None:
+        self.batches: List[int] = []
+        self.entered = threading.Event()
+        self.release = threading.Event()
+
+    @property
+    def dimension(self) -> int:
+        return DIM
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        self.batches.append(len(texts))
+        self.entered.set()
+        self.release.wait()
+        return np.array([[len(t)] * DIM for t in texts], dtype=np.float32)
+
+
+def _wait_for(condition) -> None:
+    deadline = time.monotonic() + 5
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.001)
+
+
+def test_request_that_would_overflow_waits_for_the_next_batch():
+    inner = RecordingEmbedder()
+    embedder = BatchingEmbedder(inner, max_batch_size=5, max_wait_ms=20)
+    results = {}
+
+    def encode(name, texts):
+        results[name] = embedder.encode(texts)
+
+    threads = [threading.Thread(target=encode, args=("blocker", ["x"]))]
+    threads[0].start()
+    inner.entered.wait()
+
+    # Queued, in order, behind the blocked batch
+    for name, count in [("first", 3), ("second", 3), ("third", 2)]:
+        depth = embedder.get_stats()["queue_depth"]
+        thread = threading.Thread(
+            target=encode, args=(name, ["a" * (len(name) + i) for i in range(count)])
+        )
+        thread.start()
+        threads.append(thread)
+        _wait_for(lambda: embedder.get_stats()["queue_depth"] == depth + count)
+
+    inner.release.set()
+    for thread in threads:
+        thread.join()
+
+    assert inner.batches == [1, 3, 5]
+    assert embedder.get_stats()["largest_batch"] == 5
+    for name in ("first", "second", "third"):
+        assert results[name][:, 0].tolist() == [
+            len(name) + i for i in range(len(results[name]))
+        ]
+    embedder.close()
+
+
+def test_closed_embedder_rejects_every_request():
+    inner = RecordingEmbedder()
+    inner.release.set()
+    embedder = BatchingEmbedder(inner, max_batch_size=2)
+    embedder.close()
+
+    for texts in (["a"], ["a", "b"], ["a", "b", "c"]):
+        with pytest.raises(RuntimeError):
+            embedder.encode(texts)
+    assert inner.batches == []
@@ -0,0 +1,456 @@
+"""Write-path tests for ConversationMemory against the local FAISS backend."""
+
+import hashlib
+import sqlite3
+from typing import List
+
+import numpy as np
+import pytest
+
+from memory import ConversationMemory, conversation
+from memory.conversation import Message
+from memory.embedders import Embedder
+
+DIM = 8
+
+
+class HashEmbedder(Embedder):
+    """Deterministic embedder: a vector seeded by the text's hash."""
+
+    model_id = "test-hash"
+
+    @property
+    def dimension(self) -> int:
+        return DIM
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        return np.stack(
+            [
+                np.random.default_rng(
+                    int.from_bytes(hashlib.sha256(t.encode()).digest()[:8], "little")
+                ).random(DIM, dtype=np.float32)
+                for t in texts
+            ]
+        ).reshape(-1, DIM)
+
+
+def _open(tmp_path, **kwargs) -> ConversationMemory:
+    kwargs.setdefault("background_train", False)
+    return ConversationMemory(
+        db_path=str(tmp_path / "cortex.db"),
+        vector_dir=str(tmp_path / "vectors"),
+        embedder=HashEmbedder(),
+        **kwargs,
+    )
+
+
+def _message(
+    message_id: str, content: str = "hello", user_id: str = "u", **fields
+) -> Message:
+    fields.setdefault("role", "user")
+    fields.setdefault("timestamp", "2024-01-01T00:00:00Z")
+    fields.setdefault("conversation_id", "c")
+    fields.setdefault("metadata_json", "{}")
+    return Message(user_id=user_id, message_id=message_id, content=content, **fields)
+
+
+def _vector_ids(memory, user_id="u"):
+    hits = memory.vector_store.search_similar(
+        np.zeros(DIM, np.float32), k=100, namespace=user_id
+    )
+    return {vector_id for vector_id, _ in hits}
+
+
+def test_skip_tolerates_ids_stored_after_the_lookup(tmp_path, monkeypatch):
+    memory = _open(tmp_path)
+    memory.add_message(_message("a", "stored first"))
+
+    # Another writer stores "a" between the lookup and the insert
+    monkeypatch.setattr(memory, "_stored_owners", lambda message_ids: {})
+    written = memory.add_messages(
+        [_message("a", "late copy"), _message("b")], on_conflict="skip"
+    )
+
+    assert written == ["b"]
+    assert memory.get_messages_by_ids(["a"])[0].content == "stored first"
+    assert _pending_intents(memory) == 0
+    assert _vector_ids(memory) == {"a", "b"}
+    stored = memory.store.query_one(
+        "SELECT embedding FROM message_embeddings WHERE message_id = 'a'"
+    )["embedding"]
+    assert np.array_equal(
+        np.frombuffer(stored, np.float32), HashEmbedder().encode(["stored first"])[0]
+    )
+    memory.close()
+
+
+def _intents(memory) -> int:
+    return memory.store.query_one("SELECT COUNT(*) AS n FROM vector_intents")["n"]
+
+
+def _pending_intents(memory) -> int:
+    """Intents of vector writes that did not complete."""
+    memory._flush_intents()
+    return _intents(memory)
+
+
+def test_failed_vector_add_is_replayed_on_open(tmp_path, monkeypatch):
+    memory = _open(tmp_path)
+    memory.add_message(_message("a"))
+
+    def fail(*args, **kwargs):
+        raise RuntimeError("vector backend down")
+
+    monkeypatch.setattr(memory.vector_store, "add_vectors", fail)
+    with pytest.raises(RuntimeError):
+        memory.add_messages([_message("b", "second"), _message("c", "third")])
+    assert _pending_intents(memory) == 2
+    assert _vector_ids(memory) == {"a"}
+    memory.close()
+
+    memory = _open(tmp_path)
+    assert _pending_intents(memory) == 0
+    assert _vector_ids(memory) == {"a", "b", "c"}
+    memory.close()
+
+
+def test_failed_vector_delete_is_replayed_on_open(tmp_path, monkeypatch):
+    memory = _open(tmp_path)
+    memory.add_messages([_message("a"), _message("b", user_id="v")])
+
+    def fail(*args, **kwargs):
+        raise RuntimeError("vector backend down")
+
+    monkeypatch.setattr(memory.vector_store, "delete_vectors", fail)
+    with pytest.raises(RuntimeError):
+        memory.delete_user_messages("u")
+    assert _pending_intents(memory) == 1
+    # One shared index: user "v"'s vector is visible too
+    assert _vector_ids(memory) == {"a", "b"}
+    memory.close()
+
+    memory = _open(tmp_path)
+    assert _pending_intents(memory) == 0
+    assert _vector_ids(memory) == {"b"}
+    memory.close()
+
+
+def test_lookups_span_several_in_chunks(tmp_path):
+    memory = _open(tmp_path)
+    ids = [f"m{i}" for i in range(1200)]
+    memory.add_messages([_message(message_id, message_id) for message_id in ids])
+
+    wanted = list(reversed(ids)) + ["missing", ids[0]]
+    assert [m.message_id for m in memory.get_messages_by_ids(wanted)] == ids[::-1]
+    assert len(memory._stored_vectors(ids)) == len(ids)
+    memory.close()
+
+
+@pytest.mark.parametrize("partitioned", [False, True])
+def test_conversation_exclusion_is_scoped_to_the_user(tmp_path, partitioned):
+    memory = _open(tmp_path, partitioned=partitioned)
+    memory.add_messages(
+        [_message(f"o{i}", f"other {i}", user_id="other") for i in range(200)]
+        + [_message(f"u{i}", f"mine {i}") for i in range(15)]
+        + [_message(f"cur{i}", f"current {i}", conversation_id="cur") for i in range(5)]
+    )
+
+    hits = memory.search_similar("u", "mine", limit=5, exclude_conversation_ids=["cur"])
+    assert len(hits) == 5
+    assert all(message.message_id.startswith("u") for message, _ in hits)
+    memory.close()
+
+
+def test_applied_intents_are_retired_with_a_later_write(tmp_path):
+    memory = _open(tmp_path)
+    commits = []
+    memory.store._conn.set_trace_callback(
+        lambda sql: commits.append(sql) if sql == "COMMIT" else None
+    )
+    for i in range(conversation._RETIRE_BATCHES):
+        memory.add_message(_message(f"m{i}", f"text {i}"))
+    assert len(commits) == conversation._RETIRE_BATCHES
+    assert _intents(memory) == conversation._RETIRE_BATCHES
+
+    # The next write's own transaction retires the applied batches
+    memory.add_message(_message("last"))
+    assert len(commits) == conversation._RETIRE_BATCHES + 1
+    assert _intents(memory) == 1
+    memory.close()
+
+    memory = _open(tmp_path)
+    assert _intents(memory) == 0
+    assert len(_vector_ids(memory)) == conversation._RETIRE_BATCHES + 1
+    memory.close()
+
+
+def _legacy_db(tmp_path, messages) -> None:
+    """A database as created by 0.1.0: only the ``messages`` table."""
+    conn = sqlite3.connect(str(tmp_path / "cortex.db"))
+    conn.execute(
+        """
+        CREATE TABLE messages (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id TEXT NOT NULL,
+            message_id TEXT UNIQUE NOT NULL,
+            content TEXT NOT NULL,
+            role TEXT NOT NULL,
+            timestamp TEXT NOT NULL,
+            conversation_id TEXT,
+            metadata_json TEXT,
+            embedding_path TEXT
+        )
+        """
+    )
+    conn.executemany(
+        """
+        INSERT INTO messages (user_id, message_id, content, role, timestamp,
+                              conversation_id, metadata_json)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        """,
+        [
+            (
+                m.user_id,
+                m.message_id,
+                m.content,
+                m.role,
+                m.timestamp,
+                m.conversation_id,
+                m.metadata_json,
+            )
+            for m in messages
+        ],
+    )
+    conn.commit()
+    conn.close()
+
+
+def test_timestamp_us_is_backfilled_on_a_legacy_database(tmp_path, monkeypatch):
+    # Several backfill batches, mixed offsets and one unparseable timestamp
+    monkeypatch.setattr(conversation, "_BACKFILL_BATCH", 2)
+    _legacy_db(
+        tmp_path,
+        [
+            _message("z", timestamp="2024-01-01T10:00:00Z"),
+            _message("offset", timestamp="2024-01-01T12:00:00+02:00"),
+            _message("naive", timestamp="2024-01-01T10:00:01"),
+            _message("bad", timestamp="not a date"),
+            _message("later", timestamp="2024-01-02T00:00:00.5Z"),
+        ],
+    )
+
+    memory = _open(tmp_path)
+    rows = memory.store.query_all("SELECT message_id, timestamp_us FROM messages")
+    base = 1704103200 * 1_000_000  # 2024-01-01T10:00:00Z
+    assert {row["message_id"]: row["timestamp_us"] for row in rows} == {
+        "z": base,
+        "offset": base,
+        "naive": base + 1_000_000,
+        "bad": 0,
+        "later": base + 14 * 3600 * 1_000_000 + 500_000,
+    }
+    assert [
+        m.message_id for m in memory.get_conversation("u", conversation_id="c")
+    ] == [
+        "bad",
+        "offset",
+        "z",
+        "naive",
+        "later",
+    ]
+    memory.close()
+
+
+def test_time_range_includes_since_and_excludes_until(tmp_path):
+    memory = _open(tmp_path)
+    memory.add_messages(
+        [
+            _message("before", "note", timestamp="2024-01-01T09:59:59.999999Z"),
+            _message("since", "note", timestamp="2024-01-01T10:00:00Z"),
+            _message("inside", "note", timestamp="2024-01-01T13:00:00+02:00"),
+            _message("until", "note", timestamp="2024-01-01T12:00:00"),
+        ]
+    )
+
+    # The same instants written as Z, as an offset and as naive UTC
+    for since, until in [
+        ("2024-01-01T10:00:00Z", "2024-01-01T12:00:00Z"),
+        ("2024-01-01T12:00:00+02:00", "2024-01-01T12:00:00"),
+        ("2024-01-01T10:00:00", "2024-01-01T07:00:00-05:00"),
+    ]:
+        hits = memory.search_by_content("u", "note", since=since, until=until)
+        assert [m.message_id for m in hits] == ["inside", "since"]
+        page = memory.get_conversation(
+            "u", conversation_id="c", since=since, until=until
+        )
+        assert [m.message_id for m in page] == ["since", "inside"]
+    memory.close()
+
+
+def test_like_fallback_orders_by_instant_not_by_string(tmp_path):
+    memory = _open(tmp_path)
+    memory._fts_enabled = False
+    memory.add_messages(
+        [
+            # Sorts after "newer" as a string, but is an hour older
+            _message("older", "note", timestamp="2024-01-01T12:00:00+02:00"),
+            _message("newer", "note", timestamp="2024-01-01T11:00:00Z"),
+        ]
+    )
+
+    assert [m.message_id for m in memory.search_by_content("u", "note")] == [
+        "newer",
+        "older",
+    ]
+    assert memory._lexical_ids("u", "note", 10) == ["newer", "older"]
+    memory.close()
+
+
+def _tied_messages():
+    """Seven messages over three instants; ties span page boundaries and mix
+    ``Z``, offset and naive spellings of the same instant."""
+    return [
+        _message("e", timestamp="2024-01-01T10:00:00Z"),
+        _message("b", timestamp="2024-01-01T12:00:00+02:00"),
+        _message("d", timestamp="2024-01-01T10:00:00"),
+        _message("a", timestamp="2024-01-01T11:00:00Z"),
+        _message("g", timestamp="2024-01-01T11:00:00Z"),
+        _message("c", timestamp="2024-01-01T09:00:00Z"),
+        _message("f", timestamp="2024-01-01T10:00:00Z", conversation_id="other"),
+    ]
+
+
+def _pages(memory, limit, **kwargs):
+    pages = []
+    cursor = {}
+    while True:
+        page = memory.get_conversation("u", limit=limit, **kwargs, **cursor)
+        pages.append([m.message_id for m in page])
+        if len(page) < limit:
+            return pages
+        cursor = {
+            "after_timestamp": page[-1].timestamp,
+            "after_id": page[-1].message_id,
+        }
+
+
+def test_keyset_pages_break_timestamp_ties_by_message_id(tmp_path):
+    memory = _open(tmp_path)
+    memory.add_messages(_tied_messages())
+
+    # Across conversations newest first (ties descending too), within one
+    # oldest first
+    assert _pages(memory, 2) == [["g", "a"], ["f", "e"], ["d", "b"], ["c"]]
+    assert _pages(memory, 2, conversation_id="c") == [
+        ["c", "b"],
+        ["d", "e"],
+        ["a", "g"],
+        [],
+    ]
+    memory.close()
+
+
+def test_after_timestamp_alone_continues_past_the_time(tmp_path):
+    memory = _open(tmp_path)
+    memory.add_messages(_tied_messages())
+
+    # Skips every message of the tied instant, whichever way it is spelled
+    page = memory.get_conversation(
+        "u", conversation_id="c", after_timestamp="2024-01-01T12:00:00+02:00"
+    )
+    assert [m.message_id for m in page] == ["a", "g"]
+    page = memory.get_conversation("u", after_timestamp="2024-01-01T11:00:00")
+    assert [m.message_id for m in page] == ["f", "e", "d", "b", "c"]
+
+    with pytest.raises(ValueError):
+        memory.get_conversation("u", after_id="a")
+    memory.close()
+
+
+@pytest.mark.parametrize("batch_size", [1, 2, 3, 6, 7, 8])
+def test_iter_conversation_crosses_batch_boundaries(tmp_path, monkeypatch, batch_size):
+    memory = _open(tmp_path)
+    memory.add_messages(_tied_messages())
+
+    pages = []
+    conversation_page = memory._conversation_page
+
+    def recording_conversation_page(*args, **kwargs):
+        pages.append(conversation_page(*args, **kwargs))
+        return pages[-1]
+
+    monkeypatch.setattr(memory, "_conversation_page", recording_conversation_page)
+
+    streamed = [
+        m.message_id for m in memory.iter_conversation("u", batch_size=batch_size)
+    ]
+    assert streamed == ["c", "b", "d", "e", "f", "a", "g"]
+    # Stops at the first short page, fetching an empty one only after a full one
+    assert [len(page) for page in pages][:-1] == [batch_size] * (7 // batch_size)
+    assert len(pages[-1]) == 7 % batch_size
+
+    pages.clear()
+    streamed = [
+        m.message_id
+        for m in memory.iter_conversation(
+            "u", conversation_id="c", batch_size=batch_size
+        )
+    ]
+    assert streamed == ["c", "b", "d", "e", "a", "g"]
+    memory.close()
+
+
+def test_content_index_follows_a_legacy_database(tmp_path):
+    _legacy_db(
+        tmp_path,
+        [
+            _message("a", "the quick brown fox"),
+            _message("b", "a lazy dog"),
+            _message("c", "quick thinking", user_id="v"),
+        ],
+    )
+
+    # Rows stored before the index existed are found once it is built
+    memory = _open(tmp_path)
+    assert memory._fts_enabled
+    assert [m.message_id for m in memory.search_by_content("u", "quick")] == ["a"]
+    assert [m.message_id for m in memory.search_by_content("v", "quick")] == ["c"]
+
+    # Replacing a message reindexes its new content only
+    memory.upsert_messages([_message("a", "a slow tortoise")])
+    assert memory.search_by_content("u", "quick") == []
+    assert [m.message_id for m in memory.search_by_content("u", "slow")] == ["a"]
+
+    # Deleted messages drop out of the index
+    assert memory.delete_user_messages("v") == 1
+    assert memory.search_by_content("v", "quick") == []
+    memory.close()
+
+    # The backfill runs once: reopening keeps the index as it is
+    memory = _open(tmp_path)
+    assert [m.message_id for m in memory.search_by_content("u", "slow")] == ["a"]
+    assert memory.search_by_content("u", "quick") == []
+    assert (
+        memory.store.query_one(
+            "SELECT COUNT(*) AS n FROM messages_fts WHERE messages_fts MATCH 'quick'"
+        )["n"]
+        == 0
+    )
+    memory.close()
+
+
+@pytest.mark.parametrize("fts", [True, False])
+def test_hybrid_lexical_leg_ranks_like_search_by_content(tmp_path, fts):
+    memory = _open(tmp_path)
+    memory._fts_enabled = memory._fts_enabled and fts
+    memory.add_messages(
+        [
+            _message(f"m{i}", " ".join(["fox"] * (i % 3 + 1) + ["dog"] * i))
+            for i in range(8)
+        ]
+    )
+
+    expected = [m.message_id for m in memory.search_by_content("u", "fox", limit=5)]
+    assert len(expected) == 5
+    assert memory._lexical_ids("u", "fox", 5) == expected
+    memory.close()
@@ -0,0 +1,299 @@
+"""Durability tests for the FAISS backend's base snapshots and delta logs."""
+
+import threading
+
+import numpy as np
+import pytest
+
+from memory.vectors import local_faiss
+from memory.vectors.base import SearchFilter
+from memory.vectors.local_faiss import FAISSVectorStore
+
+DIM = 8
+
+
+def _vectors(n: int, seed: int = 0) -> np.ndarray:
+    return np.random.default_rng(seed).random((n, DIM), dtype=np.float32)
+
+
+def _open(path, **kwargs) -> FAISSVectorStore:
+    kwargs.setdefault("background_train", False)
+    return FAISSVectorStore(str(path), dimension=DIM, **kwargs)
+
+
+def _ids(store, namespace=None):
+    hits = store.search_similar(_vectors(1, seed=99), k=1000, namespace=namespace)
+    return {vector_id for vector_id, _ in hits}
+
+
+def test_torn_log_tail_is_ignored(tmp_path):
+    store = _open(tmp_path)
+    store.add_vectors(_vectors(3), ["a", "b", "c"])
+    store.close()
+
+    # A crash in the middle of an append leaves a partial record behind
+    (log,) = tmp_path.glob("delta-*.log")
+    with open(log, "ab") as f:
+        f.write(local_faiss._RECORD_HEADER.pack(local_faiss._OP_ADD, 1, 5) + b'["d')
+
+    store = _open(tmp_path)
+    assert _ids(store) == {"a", "b", "c"}
+    # New records go to a fresh log, never after the torn one
+    store.add_vectors(_vectors(1, seed=1), ["e"])
+    store.close()
+
+    store = _open(tmp_path)
+    assert _ids(store) == {"a", "b", "c", "e"}
+    store.close()
+
+
+def test_merge_replaces_logs_with_base(tmp_path):
+    store = _open(tmp_path)
+    store.add_vectors(_vectors(4), ["a", "b", "c", "d"])
+    store.delete_vectors(["b"])
+    store.compact()
+    store.add_vectors(_vectors(1, seed=1), ["e"])
+    store.close()
+
+    generation = int((tmp_path / local_faiss.CURRENT_FILE).read_text())
+    assert (tmp_path / f"base-{generation:08d}.index").exists()
+    logs = sorted(int(p.stem.split("-")[1]) for p in tmp_path.glob("delta-*.log"))
+    assert logs and all(number > generation for number in logs)
+
+    store = _open(tmp_path)
+    assert _ids(store) == {"a", "c", "d", "e"}
+    assert store.get_stats()["tombstones"] == 0
+    store.close()
+
+
+def test_drop_during_merge_keeps_recreated_partition(tmp_path, monkeypatch):
+    writing = threading.Event()
+    release = threading.Event()
+    write_base = local_faiss._Partition.write_base
+
+    def slow_write_base(partition, *args):
+        writing.set()
+        release.wait(timeout=10)
+        write_base(partition, *args)
+
+    monkeypatch.setattr(local_faiss._Partition, "write_base", slow_write_base)
+
+    store = _open(tmp_path, partitioned=True, merge_threshold=2)
+    store.add_vectors(_vectors(2), ["old-1", "old-2"], namespace="alice")
+    assert writing.wait(timeout=10)
+
+    store.delete_namespace("alice")
+    store.add_vectors(_vectors(1, seed=1), ["new"], namespace="alice")
+    release.set()
+    store.close()
+
+    store = _open(tmp_path, partitioned=True)
+    assert _ids(store, "alice") == {"new"}
+    store.close()
+
+
+def test_many_partitions_do_not_hold_files_open(tmp_path):
+    resource = pytest.importorskip("resource")
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (min(256, hard), hard))
+    try:
+        store = _open(tmp_path, partitioned=True)
+        for i in range(400):
+            store.add_vectors(_vectors(1, seed=i), [f"m{i}"], namespace=f"user-{i}")
+        store.close()
+    finally:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (soft, hard))
+
+    store = _open(tmp_path, partitioned=True)
+    assert store.get_stats()["total_vectors"] == 400
+    store.close()
+
+
+def _reconstruction_error(store, exact):
+    partition = store._partitions[""]
+    live = [vector_id for vector_id in partition.ids if vector_id]
+    decoded = partition.index.reconstruct_batch(
+        np.array([partition.positions[vector_id] for vector_id in live])
+    )
+    expected = store._prepare(np.stack([exact[vector_id] for vector_id in live]))
+    return float(((decoded - expected) ** 2).sum(axis=1).mean())
+
+
+def test_pq_compaction_reencodes_exact_vectors(tmp_path):
+    dim = 16
+    vectors = np.random.default_rng(0).standard_normal((12_000, dim), np.float32)
+    ids = [f"m{i}" for i in range(len(vectors))]
+    exact = dict(zip(ids, vectors))
+
+    store = FAISSVectorStore(
+        str(tmp_path),
+        dimension=dim,
+        index_type="ivf_pq",
+        pq_m=4,
+        background_train=False,
+    )
+    store.vector_source = lambda wanted: {i: exact[i] for i in wanted if i in exact}
+    store.add_vectors(vectors, ids)
+    before = _reconstruction_error(store, exact)
+
+    for round_ in range(3):
+        store.delete_vectors(ids[round_ * 100 : (round_ + 1) * 100])
+        store.compact()
+        assert store.get_stats()["tombstones"] == 0
+        assert _reconstruction_error(store, exact) == pytest.approx(before, rel=0.05)
+    store.close()
+
+
+def test_pq_compaction_without_exact_vectors_keeps_codes(tmp_path):
+    dim = 16
+    vectors = np.random.default_rng(0).standard_normal((12_000, dim), np.float32)
+    ids = [f"m{i}" for i in range(len(vectors))]
+
+    store = FAISSVectorStore(
+        str(tmp_path),
+        dimension=dim,
+        index_type="ivf_pq",
+        pq_m=4,
+        background_train=False,
+    )
+    store.add_vectors(vectors, ids)
+    codes = store._partitions[""].index.reconstruct_n(0, 100)
+    store.delete_vectors(ids[-100:])
+    store.compact()
+
+    # Tombstones stay masked instead of the index being re-encoded
+    assert store.get_stats()["tombstones"] == 100
+    assert np.array_equal(store._partitions[""].index.reconstruct_n(0, 100), codes)
+    assert not {hit for hit, _ in store.search_similar(vectors[-1], k=5)} & set(
+        ids[-100:]
+    )
+    store.close()
+
+
+def test_excluded_ids_are_skipped(tmp_path):
+    store = _open(tmp_path)
+    store.add_vectors(_vectors(5), ["a", "b", "c", "d", "e"])
+    store.compact()
+    store.add_vectors(_vectors(1, seed=1), ["f"])
+    store.delete_vectors(["e"])
+
+    excluded = SearchFilter(exclude_message_ids=frozenset({"a", "f", "unknown"}))
+    hits = store.search_similar(_vectors(1, seed=99), k=10, filter=excluded)
+    assert {vector_id for vector_id, _ in hits} == {"b", "c", "d"}
+
+    both = SearchFilter(
+        message_ids=frozenset({"a", "b"}), exclude_message_ids=frozenset({"a"})
+    )
+    hits = store.search_similar(_vectors(1, seed=99), k=10, filter=both)
+    assert [vector_id for vector_id, _ in hits] == ["b"]
+    store.close()
+
+
+def test_missing_base_snapshot_is_an_error(tmp_path):
+    store = _open(tmp_path)
+    store.add_vectors(_vectors(3), ["a", "b", "c"])
+    store.compact()
+    store.close()
+
+    generation = int((tmp_path / local_faiss.CURRENT_FILE).read_text())
+    (tmp_path / f"base-{generation:08d}.index").unlink()
+    with pytest.raises(FileNotFoundError):
+        _open(tmp_path)
+
+
+def test_load_retries_when_a_merge_swaps_the_snapshot(tmp_path, monkeypatch):
+    writer = _open(tmp_path)
+    writer.add_vectors(_vectors(3), ["a", "b", "c"])
+    writer.compact()
+    writer.add_vectors(_vectors(1, seed=1), ["d"])
+
+    load = local_faiss._Partition._load
+    attempts = []
+
+    def racing_load(partition, current):
+        attempts.append(current)
+        if len(attempts) == 1:
+            # Another process publishes a new snapshot and deletes the one
+            # this load is about to read
+            writer.delete_vectors(["a"])
+            writer.compact()
+        load(partition, current)
+
+    monkeypatch.setattr(local_faiss._Partition, "_load", racing_load)
+    reader = _open(tmp_path, mmap=True)
+    assert len(attempts) == 2 and attempts[0] != attempts[1]
+    assert _ids(reader) == {"b", "c", "d"}
+    reader.close()
+    writer.close()
+
+
+def test_sync_fsyncs_appended_logs(tmp_path, monkeypatch):
+    store = _open(tmp_path, partitioned=True)
+    synced = []
+    monkeypatch.setattr(local_faiss, "_fsync", synced.append)
+
+    store.add_vectors(_vectors(1), ["a"], namespace="alice")
+    store.sync()
+    (log,) = (tmp_path / local_faiss.PARTITIONS_DIR).glob("*/delta-*.log")
+    # The record, the new log's directory entry and the new partition directory
+    assert {log, log.parent, log.parent.parent} <= set(synced)
+
+    synced.clear()
+    store.add_vectors(_vectors(1, seed=1), ["b"], namespace="alice")
+    store.sync()
+    assert synced == [log]
+
+    synced.clear()
+    store.sync()
+    assert synced == []
+    store.close()
+
+
+def test_merge_writes_base_without_blocking_writers(tmp_path, monkeypatch):
+    writing = threading.Event()
+    release = threading.Event()
+    write_base = local_faiss._Partition.write_base
+
+    def slow_write_base(partition, *args):
+        writing.set()
+        release.wait(timeout=10)
+        write_base(partition, *args)
+
+    monkeypatch.setattr(local_faiss._Partition, "write_base", slow_write_base)
+    store = _open(tmp_path, merge_threshold=2)
+    store.add_vectors(_vectors(2), ["a", "b"])
+    assert writing.wait(timeout=10)
+
+    # The merge holds no lock while it writes: adds, deletes and searches run
+    store.add_vectors(_vectors(1, seed=1), ["c"])
+    store.delete_vectors(["a"])
+    assert _ids(store) == {"b", "c"}
+    release.set()
+    store.close()
+
+    assert store._partitions[""].delta is None
+    store = _open(tmp_path)
+    assert _ids(store) == {"b", "c"}
+    store.close()
+
+
+def test_failed_merge_is_logged_and_reported(tmp_path, monkeypatch, caplog):
+    def failing_write_base(partition, *args):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(local_faiss._Partition, "write_base", failing_write_base)
+    store = _open(tmp_path)
+    store.add_vectors(_vectors(2), ["a", "b"])
+    store.compact()
+
+    stats = store.get_stats()
+    assert stats["background_failures"] == 1
+    assert "disk full" in stats["last_background_error"]
+    assert "disk full" in caplog.text
+    store.add_vectors(_vectors(1, seed=1), ["c"])
+    assert _ids(store) == {"a", "b", "c"}
+    store.close()
+
+    store = _open(tmp_path)
+    assert _ids(store) == {"a", "b", "c"}
+    store.close()
@@ -0,0 +1,67 @@
+"""Query construction of the Pinecone backend, against an in-memory index."""
+
+from typing import Any, Dict, List
+
+import numpy as np
+
+from memory.vectors.pinecone_store import PineconeVectorStore
+
+
+class FakeIndex:
+    """Evaluates the ``$eq`` / ``$exists`` / ``$and`` filters the store uses."""
+
+    def __init__(self, vectors: Dict[str, Dict[str, Any]]) -> None:
+        self.vectors = vectors
+        self.filters: List[Any] = []
+
+    def _matches(self, metadata, condition) -> bool:
+        if condition is None:
+            return True
+        if "$and" in condition:
+            return all(self._matches(metadata, c) for c in condition["$and"])
+        ((field, test),) = condition.items()
+        if "$exists" in test:
+            return (field in metadata) == test["$exists"]
+        return metadata.get(field) == test["$eq"]
+
+    def query(self, vector, top_k, namespace, filter, include_values):
+        self.filters.append(filter)
+        hits = [
+            {"id": vector_id, "score": entry["score"]}
+            for vector_id, entry in self.vectors.items()
+            if self._matches(entry["metadata"], filter)
+        ]
+        hits.sort(key=lambda hit: hit["score"], reverse=True)
+        return {"matches": hits[:top_k]}
+
+
+def _store(index: FakeIndex) -> PineconeVectorStore:
+    store = PineconeVectorStore.__new__(PineconeVectorStore)
+    store.index = index
+    store.partitioned = False
+    store.metric = "cosine"
+    return store
+
+
+def test_unpartitioned_search_is_scoped_to_the_user():
+    index = FakeIndex(
+        {
+            f"{user}{i}": {"score": score, "metadata": {"user_id": user}}
+            for user, score in (("u", 0.5), ("v", 0.9))
+            for i in range(3)
+        }
+    )
+    hits = _store(index).search_similar(np.zeros(4), k=2, namespace="u")
+    assert [vector_id for vector_id, _ in hits] == ["u0", "u1"]
+    assert index.filters == [{"user_id": {"$eq": "u"}}]
+
+
+def test_vectors_without_user_metadata_are_still_found():
+    index = FakeIndex(
+        {
+            "new": {"score": 0.5, "metadata": {"user_id": "u"}},
+            "old": {"score": 0.8, "metadata": {}},
+        }
+    )
+    hits = _store(index).search_similar(np.zeros(4), k=5, namespace="u")
+    assert [vector_id for vector_id, _ in hits] == ["old", "new"]
@@ -0,0 +1,97 @@
+"""Transactions, units of work and group commit in ``SQLiteStore``."""
+
+import sqlite3
+import threading
+
+import pytest
+
+from memory.store import SQLiteStore
+
+
+def _open(tmp_path, **kwargs) -> SQLiteStore:
+    store = SQLiteStore(str(tmp_path / "store.db"), **kwargs)
+    store.execute("CREATE TABLE items (id INTEGER PRIMARY KEY)")
+    return store
+
+
+def _ids(store):
+    return {row["id"] for row in store.query_all("SELECT id FROM items")}
+
+
+def test_raising_transaction_commits_nothing(tmp_path):
+    store = _open(tmp_path)
+    with pytest.raises(RuntimeError):
+        with store.transaction():
+            store.execute("INSERT INTO items (id) VALUES (1)")
+            with store.transaction():
+                store.execute("INSERT INTO items (id) VALUES (2)")
+            raise RuntimeError("abort")
+    assert _ids(store) == set()
+
+    # A failure in a nested block rolls back the outermost transaction
+    with pytest.raises(sqlite3.IntegrityError):
+        with store.transaction():
+            store.execute("INSERT INTO items (id) VALUES (3)")
+            with store.transaction():
+                store.execute("INSERT INTO items (id) VALUES (3)")
+    assert _ids(store) == set()
+    store.close()
+
+
+def test_transaction_is_invisible_to_readers_until_commit(tmp_path):
+    store = _open(tmp_path, readers=2)
+    seen = {}
+    with store.transaction():
+        store.execute("INSERT INTO items (id) VALUES (1)")
+        # The owning thread reads its own writes; other threads do not
+        seen["owner"] = _ids(store)
+        reader = threading.Thread(target=lambda: seen.update(other=_ids(store)))
+        reader.start()
+        reader.join()
+    assert seen == {"owner": {1}, "other": set()}
+    assert _ids(store) == {1}
+    store.close()
+
+
+def test_failing_unit_in_a_group_leaves_its_neighbours_committed(tmp_path):
+    store = _open(tmp_path, group_commit_ms=500)
+    store.execute("INSERT INTO items (id) VALUES (1)")
+    groups = []
+    commit_group = store._commit_group
+
+    def recording_commit_group(group):
+        groups.append(len(group))
+        commit_group(group)
+
+    store._commit_group = recording_commit_group
+
+    units = {
+        "before": [2],
+        # Its first insert must be undone along with the failing one
+        "failing": [4, 1],
+        "after": [3],
+    }
+    errors = {}
+    barrier = threading.Barrier(len(units))
+
+    def commit(name):
+        uow = store.unit_of_work()
+        for item in units[name]:
+            uow.execute("INSERT INTO items (id) VALUES (?)", [item])
+        barrier.wait()
+        try:
+            uow.commit()
+        except Exception as e:
+            errors[name] = e
+
+    threads = [threading.Thread(target=commit, args=(name,)) for name in units]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert groups == [3]
+    assert list(errors) == ["failing"]
+    assert isinstance(errors["failing"], sqlite3.IntegrityError)
+    assert _ids(store) == {1, 2, 3}
+    store.close()